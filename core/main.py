@@ -789,6 +789,11 @@ async def get_csrf_token():
     return {"csrf_token": generate_csrf_token(), "expires_in": 86400}  # 24 hours
 
 
+# Resources the UI fetches next; sent as a Link header so the browser starts
+# fetching them before it parses the page
+UI_RESOURCE_HINTS = "</static/dashboard.html>; rel=prefetch, </health>; rel=prefetch"
+
+
 # Modern frontend
 @app.get("/ui", response_class=HTMLResponse)
 async def get_ui():
@@ -797,7 +802,7 @@ async def get_ui():
         static_path = Path("static/index.html")
         if static_path.exists():
             with open(static_path, "r", encoding="utf-8") as f:
-                return f.read()
+                return HTMLResponse(f.read(), headers={"Link": UI_RESOURCE_HINTS})
         else:
             # Fallback to simple interface
             return HTMLResponse(
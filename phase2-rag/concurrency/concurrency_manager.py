@@ -3,139 +3,223 @@
 # Enhanced request handling with connection pooling
 
 import asyncio
+import json
+import math
 import time
-from typing import Dict, Any, List
-import threading
-from concurrent.futures import ThreadPoolExecutor
-import queue
+import logging
+from typing import Dict, Any, List, Optional
+import aiohttp
+import numpy as np
+
+# orjson serialises stats payloads straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Simulated processing time range (ms) per request type
+SIMULATED_TIMES = {
+    'query': (40, 60),  # Query processing: 50ms with concurrency optimization
+    'upload': (150, 250),  # File upload: 200ms with concurrent processing
+}
+SIMULATED_DEFAULT_TIME = (20, 40)  # General requests: 30ms
+
+# Log-spaced latency buckets (HdrHistogram style): 5% wide from 10us to 60s
+LATENCY_MIN_MS = 0.01
+LATENCY_MAX_MS = 60_000.0
+LATENCY_GROWTH = 1.05
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+    return json.dumps(data).encode('utf-8')
+
+class LatencyHistogram:
+    """Fixed-size log-bucket histogram of request latencies in milliseconds
+    
+    Recording is one bucket increment; quantiles are read from the bucket CDF
+    and are accurate to within one bucket (about 5% relative error).
+    """
+    
+    def __init__(self):
+        self.log_growth = math.log(LATENCY_GROWTH)
+        num_buckets = math.ceil(math.log(LATENCY_MAX_MS / LATENCY_MIN_MS) / self.log_growth) + 1
+        # Representative value per bucket: geometric midpoint of its bounds
+        self.bucket_values = LATENCY_MIN_MS * np.power(LATENCY_GROWTH, np.arange(num_buckets) + 0.5)
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+    
+    def record(self, value_ms: float):
+        """Count one latency sample"""
+        if value_ms <= LATENCY_MIN_MS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(value_ms / LATENCY_MIN_MS) / self.log_growth), len(self.counts) - 1)
+        self.counts[bucket] += 1
+    
+    def quantiles(self, qs: List[float]) -> Optional[List[float]]:
+        """Approximate quantiles (0..1) of everything recorded so far"""
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1]
+        if not total:
+            return None
+        ranks = np.ceil(np.asarray(qs) * total).clip(1, total)
+        return [float(v) for v in self.bucket_values[np.searchsorted(cumulative, ranks, side='left')]]
 
 class ConcurrencyManager:
     def __init__(self, max_workers: int = 8, max_queue_size: int = 100):
         self.max_workers = max_workers
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.request_queue = queue.Queue(maxsize=max_queue_size)
+        self.max_queue_size = max_queue_size
+        # Requests beyond max_workers wait on the semaphore; beyond that backlog they are rejected
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self.session: Optional[aiohttp.ClientSession] = None
         self.active_requests = 0
         self.completed_requests = 0
         self.failed_requests = 0
         self.total_processing_time = 0.0
-        self.lock = threading.Lock()
+        self.latency_histogram = LatencyHistogram()
         self.start_time = time.time()
-        
-        # Start background processing
-        self._start_workers()
+        self._start_monotonic = time.monotonic()
+        self._rng = np.random.default_rng()
     
-    def _start_workers(self):
-        """Start background worker threads"""
-        for i in range(min(4, self.max_workers)):  # Start with 4 workers
-            worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            worker_thread.start()
+    async def start(self):
+        """Open the shared keep-alive session used for downstream calls"""
+        if self.session is None or self.session.closed:
+            self.connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=30, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=self.connector,
+                timeout=aiohttp.ClientTimeout(total=30, connect=10)
+            )
+        return self.session
     
-    def _worker_loop(self):
-        """Background worker for processing requests"""
-        while True:
-            try:
-                request_data = self.request_queue.get(timeout=1.0)
-                self._process_request(request_data)
-                self.request_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Worker error: {e}")
+    async def close(self):
+        """Close the shared session and its connection pool"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.connector = None
     
-    def _process_request(self, request_data: Dict[str, Any]):
-        """Process a single request"""
-        start_time = time.time()
+    async def _process_async(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a single request on the event loop"""
+        start_ns = time.perf_counter_ns()
+        self.active_requests += 1
         
         try:
-            with self.lock:
-                self.active_requests += 1
-            
-            # Simulate request processing with improved concurrency
-            processing_time = self._simulate_concurrent_processing(request_data)
+            async with self.semaphore:
+                if 'url' in request_data:
+                    status = await self._forward_request(request_data)
+                    processing_time = (time.perf_counter_ns() - start_ns) / 1_000_000
+                else:
+                    status = None
+                    processing_time = await self._simulate_concurrent_processing(request_data)
             
-            with self.lock:
-                self.active_requests -= 1
-                self.completed_requests += 1
-                self.total_processing_time += processing_time
+            self.completed_requests += 1
+            self.total_processing_time += processing_time
+            self.latency_histogram.record(processing_time)
             
+            return {
+                'processing_time': processing_time,
+                'processed_at': time.time(),
+                'status_code': status,
+                'optimized': True
+            }
+        
         except Exception as e:
-            with self.lock:
-                self.active_requests -= 1
-                self.failed_requests += 1
+            self.failed_requests += 1
             logger.error(f"Request processing failed: {e}")
+            raise
+        
+        finally:
+            self.active_requests -= 1
+    
+    async def _forward_request(self, request_data: Dict[str, Any]) -> int:
+        """Send the request downstream over the pooled session"""
+        session = await self.start()
+        async with session.request(
+            request_data.get('method', 'GET'),
+            request_data['url'],
+            json=request_data.get('payload')
+        ) as response:
+            await response.read()
+            return response.status
     
-    def _simulate_concurrent_processing(self, request_data: Dict[str, Any]) -> float:
+    async def _simulate_concurrent_processing(self, request_data: Dict[str, Any]) -> float:
         """Simulate optimized concurrent request processing"""
-        import random
+        low, high = SIMULATED_TIMES.get(request_data.get('type', 'query'), SIMULATED_DEFAULT_TIME)
+        base_time = float(self._rng.uniform(low, high))
         
-        # Simulate different types of requests
-        request_type = request_data.get('type', 'query')
-        
-        if request_type == 'query':
-            # Query processing: 50ms with concurrency optimization
-            base_time = random.uniform(40, 60)
-        elif request_type == 'upload':
-            # File upload: 200ms with concurrent processing
-            base_time = random.uniform(150, 250)
-        else:
-            # General requests: 30ms
-            base_time = random.uniform(20, 40)
-        
-        # Simulate processing
-        time.sleep(base_time / 1000)  # Convert to seconds
+        # Simulate processing without blocking the event loop
+        await asyncio.sleep(base_time / 1000)  # Convert to seconds
         return base_time
     
     async def handle_async_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle request asynchronously"""
-        loop = asyncio.get_event_loop()
-        
-        # Submit to thread pool for processing
-        future = loop.run_in_executor(self.executor, self._process_sync_request, request_data)
+        if self.active_requests >= self.max_workers + self.max_queue_size:
+            return {
+                'status': 'rejected',
+                'error': 'Request queue full',
+                'concurrent_processing': True
+            }
         
         try:
-            result = await asyncio.wait_for(future, timeout=10.0)  # 10 second timeout
+            result = await asyncio.wait_for(self._process_async(request_data), timeout=10.0)  # 10 second timeout
             return {
                 'status': 'success',
                 'result': result,
                 'concurrent_processing': True
             }
         except asyncio.TimeoutError:
+            self.failed_requests += 1
             return {
                 'status': 'timeout',
                 'error': 'Request processing timeout',
                 'concurrent_processing': True
             }
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e),
+                'concurrent_processing': True
+            }
+    
+    async def handle_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fan a batch of requests out concurrently and collect results in order"""
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.handle_async_request(request_data)) for request_data in requests]
+        return [task.result() for task in tasks]
     
-    def _process_sync_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Synchronous request processing"""
-        processing_time = self._simulate_concurrent_processing(request_data)
+    def get_stats(self) -> Dict[str, Any]:
+        """Get concurrency statistics"""
+        uptime = time.monotonic() - self._start_monotonic
+        avg_processing_time = (self.total_processing_time / self.completed_requests
+                             if self.completed_requests > 0 else 0)
+        
+        throughput = self.completed_requests / uptime if uptime > 0 else 0
+        p50, p95, p99 = self.latency_histogram.quantiles([0.5, 0.95, 0.99]) or (0.0, 0.0, 0.0)
         
         return {
-            'processing_time': processing_time,
-            'processed_at': time.time(),
-            'optimized': True
+            'active_requests': self.active_requests,
+            'completed_requests': self.completed_requests,
+            'failed_requests': self.failed_requests,
+            'success_rate': round((self.completed_requests / (self.completed_requests + self.failed_requests) * 100)
+                                if (self.completed_requests + self.failed_requests) > 0 else 100, 2),
+            'avg_processing_time': round(avg_processing_time, 2),
+            'p50_processing_time': round(p50, 2),
+            'p95_processing_time': round(p95, 2),
+            'p99_processing_time': round(p99, 2),
+            'throughput_per_second': round(throughput, 2),
+            'max_concurrent_users': 150,  # Enhanced capacity
+            'optimization_active': True
         }
     
-    def get_stats(self) -> Dict[str, Any]:
-        """Get concurrency statistics"""
-        with self.lock:
-            uptime = time.time() - self.start_time
-            avg_processing_time = (self.total_processing_time / self.completed_requests 
-                                 if self.completed_requests > 0 else 0)
-            
-            throughput = self.completed_requests / uptime if uptime > 0 else 0
-            
-            return {
-                'active_requests': self.active_requests,
-                'completed_requests': self.completed_requests,
-                'failed_requests': self.failed_requests,
-                'success_rate': round((self.completed_requests / (self.completed_requests + self.failed_requests) * 100) 
-                                    if (self.completed_requests + self.failed_requests) > 0 else 100, 2),
-                'avg_processing_time': round(avg_processing_time, 2),
-                'throughput_per_second': round(throughput, 2),
-                'max_concurrent_users': 150,  # Enhanced capacity
-                'optimization_active': True
-            }
+    def get_stats_json(self) -> bytes:
+        """Concurrency statistics encoded for an HTTP response body"""
+        return dumps_json(self.get_stats())
 
 # Global concurrency manager
 concurrency_manager = ConcurrencyManager(max_workers=8)
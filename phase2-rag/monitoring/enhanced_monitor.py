@@ -3,111 +3,216 @@
 # Advanced metrics collection and analysis
 
 import time
+import logging
 import threading
 from typing import Dict, Any, List
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
+import numpy as np
+
+# Numba compiles the summary reduction when installed; NumPy is the fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+# orjson serialises metric payloads straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Seconds between phase2 metric collections, and the cap for error backoff
+COLLECTION_INTERVAL = 10
+MAX_ERROR_BACKOFF = 60
+
+# Number of samples retained per metric series
+METRICS_HISTORY_SIZE = 100
+
+# Number of recent phase2 samples averaged by get_phase2_summary
+SUMMARY_WINDOW_SIZE = 10
+
+# Columns of the phase2 sample ring buffer
+PHASE2_FIELDS = ('timestamp', 'vector_search_time', 'concurrent_capacity', 'ui_response_time', 'cache_efficiency')
+
+# Event counters bumped by the lock-free record_* methods
+EVENT_COUNTERS = ('vector_optimizations', 'concurrent_requests', 'ui_interactions')
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+    return json.dumps(data).encode('utf-8')
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _window_mean(buf, head, window):
+        """Column means of the last window rows written to a ring buffer"""
+        size = buf.shape[0]
+        n = min(head, window, size)
+        sums = np.zeros(buf.shape[1])
+        for k in range(n):
+            row = (head - 1 - k) % size
+            for col in range(buf.shape[1]):
+                sums[col] += buf[row, col]
+        return sums / n
+else:
+    def _window_mean(buf: np.ndarray, head: int, window: int) -> np.ndarray:
+        """Column means of the last window rows written to a ring buffer"""
+        n = min(head, window, buf.shape[0])
+        rows = (head - 1 - np.arange(n)) % buf.shape[0]
+        return buf[rows].mean(axis=0)
 
 class EnhancedMonitor:
     def __init__(self):
-        self.metrics = defaultdict(list)
+        self.metrics = defaultdict(lambda: deque(maxlen=METRICS_HISTORY_SIZE))
+        # Create the recorder series up front so appends never race on insertion
+        for key in ('vector_searches', 'concurrent_requests', 'ui_interactions'):
+            self.metrics[key]
+        
+        # Phase2 samples live in a preallocated ring, one row per sample
+        self._phase2_buf = np.zeros((METRICS_HISTORY_SIZE, len(PHASE2_FIELDS)), dtype=np.float64)
+        self._phase2_head = 0  # Total samples written; next row is head % size
+        
+        # Each recording thread bumps its own counters without a lock and
+        # registers them once; readers sum every thread's counters
+        self._local = threading.local()
+        self._thread_counters: List[Dict[str, int]] = []
         self.phase2_stats = {
-            'vector_optimizations': 0,
-            'concurrent_requests': 0,
-            'ui_interactions': 0,
             'performance_boost': 0.0
         }
+        # Private PCG64 generator; draws never touch the shared random module state
+        self._rng = np.random.default_rng()
         self.start_time = time.time()
-        self.lock = threading.Lock()
+        self._start_ns = time.monotonic_ns()
+        self.lock = threading.RLock()
         
         # Start monitoring thread
+        self._stop = threading.Event()
         self.monitoring_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitoring_thread.start()
     
     def _monitor_loop(self):
         """Background monitoring loop"""
-        while True:
+        consecutive_errors = 0
+        while not self._stop.is_set():
+            delay = COLLECTION_INTERVAL
             try:
                 self.collect_phase2_metrics()
-                time.sleep(10)  # Collect metrics every 10 seconds
-            except Exception as e:
-                print(f"Monitoring error: {e}")
+                consecutive_errors = 0
+            except Exception:
+                consecutive_errors += 1
+                logger.exception("Monitoring error")
+                # Back off exponentially after repeated failures
+                if consecutive_errors >= 3:
+                    delay = min(COLLECTION_INTERVAL * 2 ** (consecutive_errors - 2), MAX_ERROR_BACKOFF)
+            
+            self._stop.wait(delay)
+    
+    def stop(self):
+        """Stop the background monitoring thread"""
+        self._stop.set()
     
     def collect_phase2_metrics(self):
         """Collect Phase 2 specific metrics"""
+        current_time = time.time()
+        
+        # Simulate Phase 2 performance metrics; drawn before taking the lock
+        vector_search_time, ui_response_time, cache_efficiency = self._rng.uniform(
+            (55, 20, 75),  # Optimized search time, faster UI, better caching
+            (75, 40, 85)
+        ).tolist()
+        concurrent_capacity = int(self._rng.integers(120, 150, endpoint=True))  # Enhanced concurrency
+        
         with self.lock:
-            current_time = time.time()
-            
-            # Simulate Phase 2 performance metrics
-            import random
-            
-            metrics = {
-                'timestamp': current_time,
-                'vector_search_time': random.uniform(55, 75),  # Optimized search time
-                'concurrent_capacity': random.randint(120, 150),  # Enhanced concurrency
-                'ui_response_time': random.uniform(20, 40),  # Faster UI
-                'cache_efficiency': random.uniform(75, 85),  # Better caching
-                'optimization_factor': 1.5,  # 50% total improvement
-                'phase': 'phase2'
-            }
-            
-            self.metrics['phase2'].append(metrics)
-            
-            # Keep only recent metrics (last 100 entries)
-            if len(self.metrics['phase2']) > 100:
-                self.metrics['phase2'] = self.metrics['phase2'][-100:]
+            # Overwrites the oldest row once the ring is full
+            self._phase2_buf[self._phase2_head % METRICS_HISTORY_SIZE] = (
+                current_time,
+                vector_search_time,
+                concurrent_capacity,
+                ui_response_time,
+                cache_efficiency
+            )
+            self._phase2_head += 1
             
             # Update phase 2 stats
             self.phase2_stats['performance_boost'] = (
-                (90 - metrics['vector_search_time']) / 90 * 100  # % improvement from baseline
+                (90 - vector_search_time) / 90 * 100  # % improvement from baseline
             )
     
+    def _phase2_samples(self) -> List[Dict[str, Any]]:
+        """Phase2 samples in the ring, oldest first"""
+        size = min(self._phase2_head, METRICS_HISTORY_SIZE)
+        rows = (self._phase2_head - size + np.arange(size)) % METRICS_HISTORY_SIZE
+        samples = []
+        for row in self._phase2_buf[rows].tolist():
+            sample = dict(zip(PHASE2_FIELDS, row))
+            sample['concurrent_capacity'] = int(sample['concurrent_capacity'])
+            sample['optimization_factor'] = 1.5  # 50% total improvement
+            sample['phase'] = 'phase2'
+            samples.append(sample)
+        return samples
+    
     def record_vector_optimization(self, search_time: float, cached: bool = False):
         """Record vector search optimization event"""
-        with self.lock:
-            self.phase2_stats['vector_optimizations'] += 1
-            self.metrics['vector_searches'].append({
-                'timestamp': time.time(),
-                'search_time': search_time,
-                'cached': cached,
-                'optimized': True
-            })
+        self._counters()['vector_optimizations'] += 1
+        self.metrics['vector_searches'].append({
+            'timestamp': time.time(),
+            'search_time': search_time,
+            'cached': cached,
+            'optimized': True
+        })
     
     def record_concurrent_request(self, processing_time: float, success: bool = True):
         """Record concurrent request handling"""
-        with self.lock:
-            self.phase2_stats['concurrent_requests'] += 1
-            self.metrics['concurrent_requests'].append({
-                'timestamp': time.time(),
-                'processing_time': processing_time,
-                'success': success,
-                'concurrent_handling': True
-            })
+        self._counters()['concurrent_requests'] += 1
+        self.metrics['concurrent_requests'].append({
+            'timestamp': time.time(),
+            'processing_time': processing_time,
+            'success': success,
+            'concurrent_handling': True
+        })
     
     def record_ui_interaction(self, interaction_type: str, response_time: float):
         """Record UI interaction optimization"""
-        with self.lock:
-            self.phase2_stats['ui_interactions'] += 1
-            self.metrics['ui_interactions'].append({
-                'timestamp': time.time(),
-                'type': interaction_type,
-                'response_time': response_time,
-                'optimized': True
-            })
+        self._counters()['ui_interactions'] += 1
+        self.metrics['ui_interactions'].append({
+            'timestamp': time.time(),
+            'type': interaction_type,
+            'response_time': response_time,
+            'optimized': True
+        })
+    
+    def _counters(self) -> Dict[str, int]:
+        """Event counters owned by the calling thread"""
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = dict.fromkeys(EVENT_COUNTERS, 0)
+            with self.lock:
+                self._thread_counters.append(counters)
+        return counters
+    
+    def _event_counts(self) -> Dict[str, int]:
+        """Event counters summed over every recording thread; call with self.lock held"""
+        return {name: sum(counters[name] for counters in self._thread_counters) for name in EVENT_COUNTERS}
     
     def get_phase2_summary(self) -> Dict[str, Any]:
         """Get Phase 2 performance summary"""
         with self.lock:
-            uptime = time.time() - self.start_time
+            uptime = (time.monotonic_ns() - self._start_ns) / 1_000_000_000
             
-            # Calculate averages from recent metrics
-            recent_metrics = self.metrics['phase2'][-10:] if self.metrics['phase2'] else []
-            
-            if recent_metrics:
-                avg_vector_time = sum(m['vector_search_time'] for m in recent_metrics) / len(recent_metrics)
-                avg_concurrent_capacity = sum(m['concurrent_capacity'] for m in recent_metrics) / len(recent_metrics)
-                avg_ui_time = sum(m['ui_response_time'] for m in recent_metrics) / len(recent_metrics)
-                avg_cache_efficiency = sum(m['cache_efficiency'] for m in recent_metrics) / len(recent_metrics)
+            if self._phase2_head:
+                # One reduction over the ring for every column
+                (_, avg_vector_time, avg_concurrent_capacity,
+                 avg_ui_time, avg_cache_efficiency) = _window_mean(
+                    self._phase2_buf, self._phase2_head, SUMMARY_WINDOW_SIZE
+                ).tolist()
             else:
                 avg_vector_time = 65.0
                 avg_concurrent_capacity = 135
@@ -123,11 +228,7 @@ class EnhancedMonitor:
                     'avg_ui_response_time': round(avg_ui_time, 2),
                     'cache_efficiency_percent': round(avg_cache_efficiency, 2)
                 },
-                'optimization_stats': {
-                    'vector_optimizations': self.phase2_stats['vector_optimizations'],
-                    'concurrent_requests': self.phase2_stats['concurrent_requests'],
-                    'ui_interactions': self.phase2_stats['ui_interactions']
-                },
+                'optimization_stats': self._event_counts(),
                 'performance_boost': f"{round(self.phase2_stats['performance_boost'], 1)}%",
                 'status': 'optimal'
             }
@@ -137,10 +238,17 @@ class EnhancedMonitor:
         with self.lock:
             return {
                 'collection_time': time.time(),
-                'metrics': dict(self.metrics),
-                'phase2_stats': self.phase2_stats,
+                'metrics': {
+                    'phase2': self._phase2_samples(),
+                    **{key: list(values) for key, values in self.metrics.items()}
+                },
+                'phase2_stats': {**self._event_counts(), **self.phase2_stats},
                 'summary': self.get_phase2_summary()
             }
+    
+    def get_full_metrics_json(self) -> bytes:
+        """Complete metrics dump encoded for an HTTP response body"""
+        return dumps_json(self.get_full_metrics())
 
 # Global enhanced monitor
 enhanced_monitor = EnhancedMonitor()
@@ -4,25 +4,38 @@ Advanced monitoring with automated alerting, rollback triggers, and performance
 """
 
 import asyncio
+import math
 import time
 import json
 import logging
 import threading
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Sequence
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from collections import deque, defaultdict
-import statistics
+from datetime import datetime, timedelta, timezone
+from collections import deque, defaultdict, OrderedDict
+import numpy as np
 import redis
 import psutil
-import requests
-from prometheus_client import Gauge, Counter, Histogram, start_http_server
+from prometheus_client import Gauge, Counter, Histogram, REGISTRY, start_http_server
 import smtplib
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 import websockets
 import aiohttp
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
 @dataclass
 class MonitoringConfig:
     """Configuration for monitoring system"""
@@ -36,6 +49,7 @@ class MonitoringConfig:
     rollback_threshold_error_rate: float = 0.15  # 15%
     rollback_consecutive_failures: int = 5
     history_window: int = 300  # 5 minutes in seconds
+    disk_usage_cache_ttl: float = 60.0  # seconds between disk usage refreshes
     redis_host: str = "localhost"
     redis_port: int = 6379
     prometheus_port: int = 9090
@@ -52,82 +66,448 @@ class PerformanceMetric:
     endpoint: str = "/"
     method: str = "GET"
     user_agent: str = "monitor"
+    # Monotonic capture time used for windowing; immune to wall-clock jumps
+    timestamp_ns: int = field(default_factory=time.monotonic_ns)
+
+NS_PER_SECOND = 1_000_000_000
+
+def bucket_quantiles(bucket_values: np.ndarray, bucket_counts: np.ndarray,
+                     qs: Sequence[float]) -> Optional[List[float]]:
+    """Quantiles (0..1) read from the CDF of log-bucket counts
+    
+    bucket_values holds each bucket's representative value; counts from
+    several histograms with the same bucket layout can be summed first.
+    """
+    cumulative = np.cumsum(bucket_counts)
+    total = cumulative[-1]
+    if not total:
+        return None
+    
+    ranks = np.ceil(np.asarray(qs) * total).clip(1, total)
+    indices = np.searchsorted(cumulative, ranks, side='left')
+    return [float(v) for v in bucket_values[indices]]
+
+class LatencyHistogram:
+    """Time-sliced log-bucket histogram for approximate latency quantiles
+    
+    Each sample increments one log-spaced bucket (HdrHistogram style) in the
+    row for its time slice. window_totals sums a window's rows, and
+    bucket_quantiles reads quantiles off the summed counts, so updates are
+    O(1) and memory is fixed regardless of the sample count.
+    Quantiles are accurate to within one bucket (about 5% relative error) and
+    window edges are rounded to slice_seconds. Each slice also keeps an exact
+    latency sum and error count, so window means need no raw samples.
+    """
+    
+    def __init__(self, max_window_seconds: int = 900, slice_seconds: int = 10,
+                 min_value: float = 1e-4, max_value: float = 60.0, growth: float = 1.05):
+        self.slice_ns = slice_seconds * NS_PER_SECOND
+        self.num_slices = math.ceil(max_window_seconds / slice_seconds) + 1
+        self.min_value = min_value
+        self.log_growth = math.log(growth)
+        self.num_buckets = math.ceil(math.log(max_value / min_value) / self.log_growth) + 1
+        
+        # Representative value per bucket: geometric midpoint of its bounds
+        self.bucket_values = min_value * np.power(growth, np.arange(self.num_buckets) + 0.5)
+        self.counts = np.zeros((self.num_slices, self.num_buckets), dtype=np.int64)
+        self.sums = np.zeros(self.num_slices, dtype=np.float64)
+        self.errors = np.zeros(self.num_slices, dtype=np.int64)
+        self.slice_ids = np.full(self.num_slices, -1, dtype=np.int64)
+    
+    def record(self, value: float, timestamp_ns: int, is_error: bool = False):
+        """Count one sample in the slice covering its timestamp"""
+        slice_id = timestamp_ns // self.slice_ns
+        row = slice_id % self.num_slices
+        if self.slice_ids[row] != slice_id:
+            # Slot still holds an expired slice; recycle it
+            self.counts[row] = 0
+            self.sums[row] = 0.0
+            self.errors[row] = 0
+            self.slice_ids[row] = slice_id
+        
+        if value <= self.min_value:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(value / self.min_value) / self.log_growth), self.num_buckets - 1)
+        self.counts[row, bucket] += 1
+        self.sums[row] += value
+        if is_error:
+            self.errors[row] += 1
+    
+    def _window_rows(self, window_seconds: int, now_ns: int) -> np.ndarray:
+        """Mask of the slice rows inside the window"""
+        first_slice = (now_ns - window_seconds * NS_PER_SECOND) // self.slice_ns
+        return self.slice_ids >= first_slice
+    
+    def window_totals(self, window_seconds: int, now_ns: int):
+        """(count, latency sum, error count, bucket counts) over the window"""
+        rows = self._window_rows(window_seconds, now_ns)
+        bucket_counts = self.counts[rows].sum(axis=0)
+        return (int(bucket_counts.sum()), float(self.sums[rows].sum()),
+                int(self.errors[rows].sum()), bucket_counts)
 
 class MetricStorage:
-    """Thread-safe storage for performance metrics"""
+    """Thread-safe storage for performance metrics
+    
+    Metrics are kept in a ring buffer laid out as parallel NumPy columns so
+    statistics can be computed with vectorized operations.
+    """
+    
+    # Redis socket timeout and the bounds of the write backoff after a failure
+    REDIS_TIMEOUT = 0.5
+    REDIS_BACKOFF_INITIAL = 1.0
+    REDIS_BACKOFF_MAX = 30.0
     
-    def __init__(self, max_size: int = 10000):
-        self.metrics = deque(maxlen=max_size)
+    # Span and granularity of the per-endpoint histograms read by the alert loop
+    ALERT_WINDOW_SECONDS = 60
+    ALERT_SLICE_SECONDS = 5
+    
+    def __init__(self, max_size: int = 10000, flush_interval: float = 1.0,
+                 max_pending: int = 50000, drop_counter: Optional[Counter] = None):
+        self.max_size = max_size
+        self.timestamps = np.empty(max_size, dtype=np.float64)
+        self.timestamps_ns = np.empty(max_size, dtype=np.int64)
+        self.response_times = np.empty(max_size, dtype=np.float64)
+        self.status_codes = np.empty(max_size, dtype=np.int32)
+        self.endpoints = np.empty(max_size, dtype=object)
+        self.methods = np.empty(max_size, dtype=object)
+        self.user_agents = np.empty(max_size, dtype=object)
+        self.error_messages = np.empty(max_size, dtype=object)
+        self.head = 0  # Next slot to write
+        self.count = 0  # Number of populated slots
+        # Running per-endpoint sums and buckets so alert checks never scan samples
+        self.endpoint_histograms: Dict[str, LatencyHistogram] = {}
         self.lock = threading.Lock()
         self.redis_client = None
+        
+        # Metrics waiting to be written to Redis in the next pipelined batch.
+        # Bounded so a Redis outage drops the oldest samples instead of growing
+        # without limit; drops are counted in drop_counter when provided.
+        self._pending = deque(maxlen=max_pending)
+        self.drop_counter = drop_counter
+        self.flush_interval = flush_interval
+        self._flush_stop = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        
+        # While Redis is failing, writes are skipped until this monotonic time
+        self._redis_backoff = 0.0
+        self._redis_backoff_until_ns = 0
     
     def connect_redis(self, host: str, port: int):
         """Connect to Redis for persistent storage"""
         try:
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+            self.redis_client = redis.Redis(
+                host=host,
+                port=port,
+                decode_responses=True,
+                socket_timeout=self.REDIS_TIMEOUT,
+                socket_connect_timeout=self.REDIS_TIMEOUT
+            )
             self.redis_client.ping()
             logging.info("Connected to Redis for metric storage")
+            self._start_flush_thread()
         except Exception as e:
             logging.warning(f"Could not connect to Redis: {e}")
             self.redis_client = None
     
+    def _start_flush_thread(self):
+        """Start the background thread that batches metrics into Redis"""
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        
+        self._flush_stop.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+    
+    def _flush_loop(self):
+        """Flush pending metrics every flush_interval seconds"""
+        while not self._flush_stop.wait(self.flush_interval):
+            self.flush_pending()
+    
     def add_metric(self, metric: PerformanceMetric):
         """Add performance metric to storage"""
         with self.lock:
-            self.metrics.append(metric)
+            i = self.head
+            self.timestamps[i] = metric.timestamp
+            self.timestamps_ns[i] = metric.timestamp_ns
+            self.response_times[i] = metric.response_time
+            self.status_codes[i] = metric.status_code
+            self.endpoints[i] = metric.endpoint
+            self.methods[i] = metric.method
+            self.user_agents[i] = metric.user_agent
+            self.error_messages[i] = metric.error_message
+            self.head = (i + 1) % self.max_size
+            self.count = min(self.count + 1, self.max_size)
+            
+            histogram = self.endpoint_histograms.get(metric.endpoint)
+            if histogram is None:
+                histogram = self.endpoint_histograms[metric.endpoint] = LatencyHistogram(
+                    max_window_seconds=self.ALERT_WINDOW_SECONDS,
+                    slice_seconds=self.ALERT_SLICE_SECONDS
+                )
+            histogram.record(metric.response_time, metric.timestamp_ns,
+                             is_error=not 200 <= metric.status_code < 300)
         
-        # Store in Redis if available
+        # Queue for the next Redis batch if available. While Redis is backing
+        # off, persistence is skipped so local capture is unaffected.
         if self.redis_client:
+            if self._redis_degraded():
+                self._count_drop()
+                return
+            if len(self._pending) == self._pending.maxlen:
+                self._count_drop()  # append below evicts the oldest pending metric
+            self._pending.append(metric)
+    
+    def _count_drop(self):
+        """Record a metric that will never reach Redis"""
+        if self.drop_counter is not None:
+            self.drop_counter.inc()
+    
+    def _redis_degraded(self) -> bool:
+        """True while Redis writes are suspended after a failed flush"""
+        return time.monotonic_ns() < self._redis_backoff_until_ns
+    
+    def flush_pending(self) -> int:
+        """Write all pending metrics to Redis in a single pipeline round-trip"""
+        if not self.redis_client or not self._pending:
+            return 0
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        batch_size = 0
+        
+        while self._pending:
             try:
-                metric_data = {
-                    'timestamp': metric.timestamp,
-                    'response_time': metric.response_time,
-                    'status_code': metric.status_code,
-                    'endpoint': metric.endpoint,
-                    'error': metric.error_message or ""
-                }
-                
-                # Store with expiration
-                key = f"perf_metric:{int(metric.timestamp * 1000)}"
-                self.redis_client.setex(key, 3600, json.dumps(metric_data))  # 1 hour TTL
-                
-            except Exception as e:
-                logging.error(f"Failed to store metric in Redis: {e}")
+                metric = self._pending.popleft()
+            except IndexError:
+                break
+            
+            metric_data = {
+                'timestamp': metric.timestamp,
+                'response_time': metric.response_time,
+                'status_code': metric.status_code,
+                'endpoint': metric.endpoint,
+                'error': metric.error_message or ""
+            }
+            
+            # Store with expiration
+            key = f"perf_metric:{int(metric.timestamp * 1000)}"
+            pipe.setex(key, 3600, dumps_json(metric_data))  # 1 hour TTL
+            batch_size += 1
+        
+        try:
+            pipe.execute()
+        except Exception as e:
+            # Suspend writes with exponential backoff rather than retrying
+            # a degraded Redis on every flush
+            self._redis_backoff = min(
+                self._redis_backoff * 2 or self.REDIS_BACKOFF_INITIAL,
+                self.REDIS_BACKOFF_MAX
+            )
+            self._redis_backoff_until_ns = time.monotonic_ns() + int(self._redis_backoff * NS_PER_SECOND)
+            logging.error(
+                f"Failed to store {batch_size} metrics in Redis, "
+                f"pausing writes for {self._redis_backoff:.0f}s: {e}"
+            )
+            # The failed batch is not retried, so every metric in it is lost
+            if self.drop_counter is not None:
+                self.drop_counter.inc(batch_size)
+            return 0
+        
+        self._redis_backoff = 0.0
+        return batch_size
+    
+    def close(self):
+        """Stop the flush thread and write any remaining metrics"""
+        self._flush_stop.set()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=self.flush_interval * 2)
+            self._flush_thread = None
+        self.flush_pending()
+    
+    def _window_slices(self, window_seconds: int, now_ns: Optional[int] = None) -> List[slice]:
+        """Ring-buffer slices, oldest first, holding samples inside the window
+        
+        Monotonic timestamps are appended in non-decreasing order, so each
+        contiguous segment of the ring is sorted and the cutoff is found by
+        binary search.
+        """
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        cutoff_ns = now_ns - window_seconds * NS_PER_SECOND
+        
+        if self.count < self.max_size:
+            start = int(np.searchsorted(self.timestamps_ns[:self.count], cutoff_ns, side='left'))
+            return [slice(start, self.count)]
+        
+        # Full ring: [head:] holds the older samples, [:head] the newer ones
+        older = self.timestamps_ns[self.head:]
+        if len(older) and older[-1] >= cutoff_ns:
+            start = self.head + int(np.searchsorted(older, cutoff_ns, side='left'))
+            return [slice(start, self.max_size), slice(0, self.head)]
+        
+        start = int(np.searchsorted(self.timestamps_ns[:self.head], cutoff_ns, side='left'))
+        return [slice(start, self.head)]
+    
+    @staticmethod
+    def _window_column(column: np.ndarray, slices: List[slice]) -> np.ndarray:
+        """Copy of a column restricted to the given ring slices"""
+        if len(slices) == 1:
+            return column[slices[0]].copy()
+        return np.concatenate([column[s] for s in slices])
     
     def get_recent_metrics(self, window_seconds: int = 300) -> List[PerformanceMetric]:
         """Get metrics from recent time window"""
-        cutoff_time = time.time() - window_seconds
-        
         with self.lock:
-            return [m for m in self.metrics if m.timestamp >= cutoff_time]
+            return [
+                PerformanceMetric(
+                    timestamp=float(self.timestamps[i]),
+                    response_time=float(self.response_times[i]),
+                    status_code=int(self.status_codes[i]),
+                    error_message=self.error_messages[i],
+                    endpoint=self.endpoints[i],
+                    method=self.methods[i],
+                    user_agent=self.user_agents[i],
+                    timestamp_ns=int(self.timestamps_ns[i])
+                )
+                for window in self._window_slices(window_seconds)
+                for i in range(window.start, window.stop)
+            ]
     
     def get_statistics(self, window_seconds: int = 300) -> Dict[str, Any]:
         """Calculate performance statistics for time window"""
-        recent_metrics = self.get_recent_metrics(window_seconds)
+        return self.get_window_statistics((window_seconds,))[window_seconds]
+    
+    def get_window_statistics(self, windows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """Calculate statistics for several nested time windows in one pass
         
-        if not recent_metrics:
-            return {}
+        Only the largest window is copied out of the ring; smaller windows are
+        suffixes of it located by binary search, and their means come from a
+        single cumulative sum. Every statistic of a window, quantiles included,
+        is computed from the same ring samples.
+        """
+        now_ns = time.monotonic_ns()
         
-        response_times = [m.response_time for m in recent_metrics]
-        success_count = sum(1 for m in recent_metrics if 200 <= m.status_code < 300)
-        error_count = len(recent_metrics) - success_count
+        with self.lock:
+            slices = self._window_slices(max(windows), now_ns)
+            timestamps_ns = self._window_column(self.timestamps_ns, slices)
+            response_times = self._window_column(self.response_times, slices)
+            status_codes = self._window_column(self.status_codes, slices)
+        
+        total = len(response_times)
+        success = (status_codes >= 200) & (status_codes < 300)
+        # Prefix sums with a leading zero so any suffix sum is a subtraction
+        time_sums = np.concatenate(([0.0], np.cumsum(response_times)))
+        success_sums = np.concatenate(([0], np.cumsum(success)))
+        
+        results = {}
+        for window_seconds in windows:
+            start = int(np.searchsorted(timestamps_ns, now_ns - window_seconds * NS_PER_SECOND, side='left'))
+            count = total - start
+            if not count:
+                results[window_seconds] = {}
+                continue
+            
+            window_times = response_times[start:]
+            success_count = int(success_sums[-1] - success_sums[start])
+            error_count = count - success_count
+            median, p95 = np.percentile(window_times, [50, 95])
+            
+            results[window_seconds] = {
+                'total_requests': count,
+                'success_count': success_count,
+                'error_count': error_count,
+                'error_rate': error_count / count,
+                'avg_response_time': float((time_sums[-1] - time_sums[start]) / count),
+                'median_response_time': float(median),
+                'p95_response_time': float(p95),
+                'min_response_time': float(window_times.min()),
+                'max_response_time': float(window_times.max())
+            }
+        
+        return results
+
+    def get_alert_statistics(self, window_seconds: int = ALERT_WINDOW_SECONDS) -> Dict[str, Any]:
+        """Request totals, mean and p95 latency from the per-endpoint histograms
+        
+        Reads only the running sums and bucket counts, so the cost is independent
+        of the number of samples in the window. window_seconds is capped at
+        ALERT_WINDOW_SECONDS.
+        """
+        now_ns = time.monotonic_ns()
+        window_seconds = min(window_seconds, self.ALERT_WINDOW_SECONDS)
+        
+        with self.lock:
+            histograms = list(self.endpoint_histograms.items())
+            totals = [(endpoint, histogram.window_totals(window_seconds, now_ns))
+                      for endpoint, histogram in histograms]
+        
+        total = 0
+        time_sum = 0.0
+        error_count = 0
+        bucket_counts = None
+        endpoints = {}
+        for endpoint, (count, endpoint_sum, endpoint_errors, endpoint_buckets) in totals:
+            if not count:
+                continue
+            total += count
+            time_sum += endpoint_sum
+            error_count += endpoint_errors
+            bucket_counts = endpoint_buckets if bucket_counts is None else bucket_counts + endpoint_buckets
+            endpoints[endpoint] = {
+                'total_requests': count,
+                'error_rate': endpoint_errors / count,
+                'avg_response_time': endpoint_sum / count
+            }
+        
+        if not total:
+            return {}
         
+        # Every endpoint histogram shares one bucket layout
+        p95 = bucket_quantiles(histograms[0][1].bucket_values, bucket_counts, (0.95,))[0]
         return {
-            'total_requests': len(recent_metrics),
-            'success_count': success_count,
+            'total_requests': total,
+            'success_count': total - error_count,
             'error_count': error_count,
-            'error_rate': error_count / len(recent_metrics),
-            'avg_response_time': statistics.mean(response_times),
-            'median_response_time': statistics.median(response_times),
-            'p95_response_time': statistics.quantiles(response_times, n=20)[18] if len(response_times) >= 20 else max(response_times),
-            'min_response_time': min(response_times),
-            'max_response_time': max(response_times)
+            'error_rate': error_count / total,
+            'avg_response_time': time_sum / total,
+            'p95_response_time': p95,
+            'endpoints': endpoints
         }
 
+# Status class label for each HTTP status hundred (index = status_code // 100)
+STATUS_CLASSES = ('0xx', '1xx', '2xx', '3xx', '4xx', '5xx')
+
+class _PendingRequestFlusher:
+    """Registry collector that folds buffered request metrics in before a scrape
+    
+    Registered ahead of the request metrics so the registry, which collects in
+    registration order, sees the flushed values in the same scrape.
+    """
+    
+    def __init__(self, metrics: 'PrometheusMetrics'):
+        self.metrics = metrics
+    
+    def collect(self):
+        self.metrics.flush_pending()
+        return []
+
 class PrometheusMetrics:
     """Prometheus metrics for monitoring integration"""
     
+    # Buffered requests that force an inline flush if no scrape drains them
+    MAX_PENDING_REQUESTS = 10000
+    
     def __init__(self):
+        # Bound metric children per (endpoint, method, status) label tuple
+        self._histogram_children: Dict[tuple, Any] = {}
+        self._counter_children: Dict[tuple, Any] = {}
+        
+        # (labels, response_time) pairs recorded since the last scrape.
+        # deque.append/popleft are atomic, so the request path takes no lock
+        # and the scrape thread applies one Counter.inc per label set.
+        self._pending_requests = deque()
+        REGISTRY.register(_PendingRequestFlusher(self))
+        
         # Response time histogram
         self.response_time_histogram = Histogram(
             'rag_response_time_seconds',
@@ -170,22 +550,42 @@ class PrometheusMetrics:
             'rag_active_connections',
             'Number of active connections'
         )
+        
+        # Metrics discarded because the Redis write queue was full
+        self.dropped_metrics_counter = Counter(
+            'rag_monitor_dropped_metrics_total',
+            'Metrics dropped from the Redis write queue'
+        )
     
     def record_request(self, metric: PerformanceMetric):
         """Record a request metric"""
-        status_class = f"{metric.status_code // 100}xx"
+        status_index = metric.status_code // 100
+        status_class = STATUS_CLASSES[status_index] if 0 <= status_index < len(STATUS_CLASSES) else f"{status_index}xx"
+        self._pending_requests.append(((metric.endpoint, metric.method, status_class), metric.response_time))
+        if len(self._pending_requests) >= self.MAX_PENDING_REQUESTS:
+            self.flush_pending()
+    
+    def flush_pending(self):
+        """Apply buffered request metrics, incrementing each counter once"""
+        counts: Dict[tuple, int] = defaultdict(int)
         
-        self.response_time_histogram.labels(
-            endpoint=metric.endpoint,
-            method=metric.method,
-            status=status_class
-        ).observe(metric.response_time)
+        while self._pending_requests:
+            try:
+                key, response_time = self._pending_requests.popleft()
+            except IndexError:
+                break
+            
+            histogram = self._histogram_children.get(key)
+            if histogram is None:
+                histogram = self._histogram_children.setdefault(key, self.response_time_histogram.labels(*key))
+            histogram.observe(response_time)
+            counts[key] += 1
         
-        self.request_counter.labels(
-            endpoint=metric.endpoint,
-            method=metric.method,
-            status=status_class
-        ).inc()
+        for key, count in counts.items():
+            counter = self._counter_children.get(key)
+            if counter is None:
+                counter = self._counter_children.setdefault(key, self.request_counter.labels(*key))
+            counter.inc(count)
     
     def update_error_rate(self, error_rate: float):
         """Update error rate gauge"""
@@ -199,60 +599,114 @@ class PrometheusMetrics:
 class AlertManager:
     """Manage alerts and notifications"""
     
+    COOLDOWN_SHARDS = 16  # Power of two so shard selection is a bit mask
+    COOLDOWN_SHARD_SIZE = 64  # LRU capacity per shard (1024 alert types total)
+    
     def __init__(self, config: MonitoringConfig):
         self.config = config
-        self.alert_history = deque(maxlen=1000)
-        self.alert_cooldown = defaultdict(float)  # Prevent alert spam
+        self.alert_history = deque(maxlen=1000)  # deque.append is thread-safe
+        # Last-sent times per alert type, striped across independently locked
+        # shards so unrelated alert types never contend (prevents alert spam)
+        self._cooldown_shards = [(threading.Lock(), OrderedDict()) for _ in range(self.COOLDOWN_SHARDS)]
         self.cooldown_period = 300  # 5 minutes
+        self.cooldown_period_ns = self.cooldown_period * NS_PER_SECOND
+        self.session: Optional[aiohttp.ClientSession] = None  # Shared for webhook delivery
+    
+    def _cooldown_shard(self, alert_type: str):
+        """Lock and cooldown table responsible for an alert type"""
+        return self._cooldown_shards[hash(alert_type) & (self.COOLDOWN_SHARDS - 1)]
     
     def should_send_alert(self, alert_type: str) -> bool:
         """Check if alert should be sent based on cooldown"""
-        last_sent = self.alert_cooldown.get(alert_type, 0)
-        return time.time() - last_sent > self.cooldown_period
+        lock, cooldowns = self._cooldown_shard(alert_type)
+        with lock:
+            last_sent_ns = cooldowns.get(alert_type)
+        return last_sent_ns is None or time.monotonic_ns() - last_sent_ns > self.cooldown_period_ns
+    
+    def _claim_alert(self, alert_type: str) -> bool:
+        """Atomically check the cooldown and mark the alert type as sent"""
+        lock, cooldowns = self._cooldown_shard(alert_type)
+        now_ns = time.monotonic_ns()
+        with lock:
+            last_sent_ns = cooldowns.get(alert_type)
+            if last_sent_ns is not None and now_ns - last_sent_ns <= self.cooldown_period_ns:
+                return False
+            cooldowns[alert_type] = now_ns
+            cooldowns.move_to_end(alert_type)
+            if len(cooldowns) > self.COOLDOWN_SHARD_SIZE:
+                cooldowns.popitem(last=False)  # Forget the least recently sent type
+        return True
     
-    def send_alert(self, alert_type: str, message: str, severity: str = "WARNING"):
+    async def send_alert(self, alert_type: str, message: str, severity: str = "WARNING"):
         """Send alert through configured channels"""
-        if not self.should_send_alert(alert_type):
+        if not self._claim_alert(alert_type):
             return
         
         alert_data = {
-            'timestamp': datetime.now().isoformat(),
+            'ts_ns': time.time_ns(),  # Formatted only when the alert leaves the process
             'type': alert_type,
             'severity': severity,
             'message': message
         }
         
         self.alert_history.append(alert_data)
-        self.alert_cooldown[alert_type] = time.time()
         
         logging.warning(f"ALERT [{severity}] {alert_type}: {message}")
         
-        # Send to webhook URLs
-        self._send_webhook_alerts(alert_data)
+        deliveries = [self._send_webhook_alerts(alert_data)]
         
-        # Send email if configured
+        # Send email if configured; smtplib blocks, so keep it off the event loop
         if self.config.email_config:
-            self._send_email_alert(alert_data)
+            deliveries.append(asyncio.to_thread(self._send_email_alert, alert_data))
+        
+        await asyncio.gather(*deliveries)
     
-    def _send_webhook_alerts(self, alert_data: Dict[str, Any]):
-        """Send alerts to webhook URLs"""
-        for webhook_url in self.config.webhook_urls:
-            try:
-                requests.post(
-                    webhook_url,
-                    json=alert_data,
-                    timeout=5.0,
-                    headers={'Content-Type': 'application/json'}
-                )
-            except Exception as e:
-                logging.error(f"Failed to send webhook alert to {webhook_url}: {e}")
+    @staticmethod
+    def format_alert(alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """External view of an alert with its ISO 8601 UTC timestamp"""
+        formatted = {key: value for key, value in alert_data.items() if key != 'ts_ns'}
+        formatted['timestamp'] = datetime.fromtimestamp(alert_data['ts_ns'] / NS_PER_SECOND, tz=timezone.utc).isoformat()
+        return formatted
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session so webhook calls reuse connections"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5.0))
+        return self.session
+    
+    async def _post_webhook(self, session: aiohttp.ClientSession, webhook_url: str, payload: bytes):
+        """Deliver an alert to a single webhook URL"""
+        try:
+            async with session.post(webhook_url, data=payload, headers={'Content-Type': 'application/json'}) as response:
+                await response.read()
+        except Exception as e:
+            logging.error(f"Failed to send webhook alert to {webhook_url}: {e}")
+    
+    async def _send_webhook_alerts(self, alert_data: Dict[str, Any]):
+        """Send alerts to all webhook URLs concurrently"""
+        if not self.config.webhook_urls:
+            return
+        
+        session = await self._get_session()
+        payload = dumps_json(self.format_alert(alert_data))  # Encoded once for every webhook
+        await asyncio.gather(*(
+            self._post_webhook(session, webhook_url, payload)
+            for webhook_url in self.config.webhook_urls
+        ))
+    
+    async def close(self):
+        """Close the shared webhook session"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
     
     def _send_email_alert(self, alert_data: Dict[str, Any]):
         """Send email alert"""
         try:
             email_config = self.config.email_config
+            alert_data = self.format_alert(alert_data)
             
-            msg = MimeMultipart()
+            msg = MIMEMultipart()
             msg['From'] = email_config['from']
             msg['To'] = email_config['to']
             msg['Subject'] = f"RAG System Alert: {alert_data['type']}"
@@ -269,7 +723,7 @@ class AlertManager:
             Please check the monitoring dashboard for more details.
             """
             
-            msg.attach(MimeText(body, 'plain'))
+            msg.attach(MIMEText(body, 'plain'))
             
             server = smtplib.SMTP(email_config['smtp_host'], email_config.get('smtp_port', 587))
             server.starttls()
@@ -285,8 +739,8 @@ class PerformanceMonitor:
     
     def __init__(self, config: MonitoringConfig):
         self.config = config
-        self.storage = MetricStorage()
         self.prometheus = PrometheusMetrics()
+        self.storage = MetricStorage(drop_counter=self.prometheus.dropped_metrics_counter)
         self.alert_manager = AlertManager(config)
         self.monitoring_active = False
         self.rollback_callback: Optional[Callable] = None
@@ -295,6 +749,14 @@ class PerformanceMonitor:
         # WebSocket connections for real-time updates
         self.websocket_clients = set()
         
+        # In-flight alert deliveries, referenced until they finish
+        self._alert_tasks = set()
+        
+        # Latest CPU reading from the system monitor loop and cached disk usage
+        self._last_cpu_percent = 0.0
+        self._disk_usage_percent = 0.0
+        self._disk_usage_checked_ns: Optional[int] = None
+        
         # Setup storage
         self.storage.connect_redis(config.redis_host, config.redis_port)
     
@@ -324,10 +786,20 @@ class PerformanceMonitor:
             logging.error(f"Monitoring error: {e}")
         finally:
             self.monitoring_active = False
+            if self._alert_tasks:
+                await asyncio.gather(*self._alert_tasks, return_exceptions=True)
+            await self.alert_manager.close()
+    
+    def _dispatch_alert(self, alert_type: str, message: str, severity: str = "WARNING"):
+        """Send an alert in the background so delivery never stalls monitoring"""
+        task = asyncio.create_task(self.alert_manager.send_alert(alert_type, message, severity=severity))
+        self._alert_tasks.add(task)
+        task.add_done_callback(self._alert_tasks.discard)
     
     def stop_monitoring(self):
         """Stop monitoring system"""
         self.monitoring_active = False
+        self.storage.close()
     
     async def _monitor_api_health(self):
         """Monitor API endpoint health"""
@@ -335,16 +807,18 @@ class PerformanceMonitor:
             while self.monitoring_active:
                 try:
                     start_time = time.time()
+                    start_ns = time.monotonic_ns()
                     
                     # Health check request
                     async with session.get(
                         f"{self.config.api_endpoint}/health",
                         timeout=aiohttp.ClientTimeout(total=10.0)
                     ) as response:
-                        response_time = time.time() - start_time
+                        response_time = (time.monotonic_ns() - start_ns) / NS_PER_SECOND
                         
                         metric = PerformanceMetric(
                             timestamp=start_time,
+                            timestamp_ns=start_ns,
                             response_time=response_time,
                             status_code=response.status,
                             endpoint="/health",
@@ -376,10 +850,15 @@ class PerformanceMonitor:
     
     async def _monitor_system_resources(self):
         """Monitor system resource usage"""
+        # Prime the counters; later non-blocking calls report usage since the
+        # previous call, so the loop's own sleep is the sampling window
+        psutil.cpu_percent(interval=None)
+        
         while self.monitoring_active:
             try:
                 # CPU usage
-                cpu_percent = psutil.cpu_percent(interval=1)
+                cpu_percent = psutil.cpu_percent(interval=None)
+                self._last_cpu_percent = cpu_percent
                 
                 # Memory usage
                 memory = psutil.virtual_memory()
@@ -409,7 +888,7 @@ class PerformanceMonitor:
         """Check for alert conditions and trigger notifications"""
         while self.monitoring_active:
             try:
-                stats = self.storage.get_statistics(window_seconds=60)  # 1-minute window
+                stats = self.storage.get_alert_statistics(window_seconds=60)  # 1-minute window
                 
                 if not stats:
                     await asyncio.sleep(self.config.check_interval)
@@ -418,7 +897,7 @@ class PerformanceMonitor:
                 # Check response time threshold
                 avg_response_time = stats.get('avg_response_time', 0)
                 if avg_response_time > self.config.alert_threshold_response_time:
-                    self.alert_manager.send_alert(
+                    self._dispatch_alert(
                         'high_response_time',
                         f"Average response time {avg_response_time * 1000:.1f}ms exceeds threshold {self.config.alert_threshold_response_time * 1000:.1f}ms"
                     )
@@ -428,7 +907,7 @@ class PerformanceMonitor:
                 self.prometheus.update_error_rate(error_rate)
                 
                 if error_rate > self.config.alert_threshold_error_rate:
-                    self.alert_manager.send_alert(
+                    self._dispatch_alert(
                         'high_error_rate',
                         f"Error rate {error_rate * 100:.1f}% exceeds threshold {self.config.alert_threshold_error_rate * 100:.1f}%",
                         severity="CRITICAL"
@@ -473,7 +952,7 @@ class PerformanceMonitor:
             self.consecutive_failures += 1
             
             if self.consecutive_failures >= self.config.rollback_consecutive_failures:
-                self.alert_manager.send_alert(
+                self._dispatch_alert(
                     'automated_rollback',
                     f"Triggering automated rollback due to {self.consecutive_failures} consecutive failures. "
                     f"Response time: {avg_response_time * 1000:.1f}ms, Error rate: {error_rate * 100:.1f}%",
@@ -525,27 +1004,37 @@ class PerformanceMonitor:
         if not self.websocket_clients:
             return
         
-        message = json.dumps(data)
-        disconnected_clients = set()
-        
-        for client in self.websocket_clients:
-            try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logging.error(f"Error broadcasting to client: {e}")
-                disconnected_clients.add(client)
+        # Serialize once and send to every client concurrently; decoded so
+        # clients keep receiving text frames
+        message = dumps_json(data).decode('utf-8')
+        clients = list(self.websocket_clients)
+        results = await asyncio.gather(
+            *(client.send(message) for client in clients),
+            return_exceptions=True
+        )
         
         # Remove disconnected clients
-        for client in disconnected_clients:
-            self.websocket_clients.discard(client)
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                if not isinstance(result, websockets.exceptions.ConnectionClosed):
+                    logging.error(f"Error broadcasting to client: {result}")
+                self.websocket_clients.discard(client)
+    
+    def _get_disk_usage_percent(self) -> float:
+        """Root disk usage, refreshed at most once per disk_usage_cache_ttl"""
+        now_ns = time.monotonic_ns()
+        ttl_ns = self.config.disk_usage_cache_ttl * NS_PER_SECOND
+        if self._disk_usage_checked_ns is None or now_ns - self._disk_usage_checked_ns > ttl_ns:
+            self._disk_usage_percent = psutil.disk_usage('/').percent
+            self._disk_usage_checked_ns = now_ns
+        return self._disk_usage_percent
     
     def get_monitoring_dashboard_data(self) -> Dict[str, Any]:
         """Get comprehensive monitoring data for dashboard"""
-        stats_1min = self.storage.get_statistics(60)
-        stats_5min = self.storage.get_statistics(300)
-        stats_15min = self.storage.get_statistics(900)
+        window_stats = self.storage.get_window_statistics((60, 300, 900))
+        stats_1min = window_stats[60]
+        stats_5min = window_stats[300]
+        stats_15min = window_stats[900]
         
         return {
             'timestamp': time.time(),
@@ -555,11 +1044,14 @@ class PerformanceMonitor:
                 '15min': stats_15min
             },
             'system': {
-                'cpu_percent': psutil.cpu_percent(),
+                'cpu_percent': self._last_cpu_percent,
                 'memory_percent': psutil.virtual_memory().percent,
-                'disk_usage': psutil.disk_usage('/').percent
+                'disk_usage': self._get_disk_usage_percent()
             },
-            'alerts': list(self.alert_manager.alert_history)[-10:],  # Last 10 alerts
+            'alerts': [  # Last 10 alerts
+                self.alert_manager.format_alert(alert)
+                for alert in list(self.alert_manager.alert_history)[-10:]
+            ],
             'thresholds': {
                 'response_time_alert': self.config.alert_threshold_response_time * 1000,
                 'response_time_rollback': self.config.rollback_threshold_response_time * 1000,
@@ -11,103 +11,344 @@ import time
 import logging
 from pathlib import Path
 
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    requests = None
+    REQUESTS_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class SimplePhase2Deployer:
-    """Phase 2 enhancements deployment"""
-    
-    def __init__(self):
-        self.base_dir = Path('/home/shu/Developer/ProjektSusui/ProjectSusi-main')
-        self.phase2_dir = self.base_dir / 'website' / 'phase2-rag'
-        self.success_count = 0
-        self.total_components = 4
-        
-    def check_phase1_status(self):
-        """Verify Phase 1 is running successfully"""
-        try:
-            import requests
-            response = requests.get('http://localhost:8001/api/v1/optimization/status', timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'active':
-                    logger.info("✅ Phase 1 optimizations confirmed active")
-                    return True
-            logger.error("❌ Phase 1 not fully active")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Cannot verify Phase 1 status: {e}")
-            return False
-    
-    def deploy_vector_optimization(self):
-        """Deploy advanced vector search optimizations"""
-        try:
-            logger.info("🎯 Deploying vector search optimization...")
-            
-            vector_optimizer = '''
+def _build_http_session():
+    """Keep-alive session with a small connection pool for repeated health checks"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_SESSION = _build_http_session() if REQUESTS_AVAILABLE else None
+
+# Generated Phase 2 artefacts, encoded once at import and written verbatim by
+# the deploy_* methods
+
+# Vector search optimizer module
+VECTOR_OPTIMIZER_SRC = '''
 # Advanced Vector Search Optimization
 # Enhanced FAISS indexing with intelligent caching
 
+import asyncio
+import hashlib
 import numpy as np
 import time
-from typing import List, Tuple, Dict, Any
+import logging
+from functools import lru_cache
+from typing import List, Tuple, Dict, Any, Optional
 import threading
+from collections import OrderedDict
 
-class VectorSearchOptimizer:
+# SimSIMD provides AVX2/AVX-512/NEON distance kernels; NumPy BLAS is the fallback
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    simsimd = None
+    SIMSIMD_AVAILABLE = False
+
+# Faiss backs the optional compressed IVF-PQ index
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    faiss = None
+    FAISS_AVAILABLE = False
+
+# Numba compiles exact top-k kernels specialised for a (dim, top_k) pair
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+# xxHash3 fingerprints the full query buffer at memory bandwidth when installed
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    xxhash = None
+    XXHASH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Corpora at least this large are ranked on int8 codes, then reranked in FP32
+INT8_MIN_VECTORS = 100_000
+INT8_RERANK_FACTOR = 4
+
+# Bounded LRU of recent searches; entries expire after SEARCH_CACHE_TTL seconds
+SEARCH_CACHE_SIZE = 4096
+# The LRU is striped over this many independently locked shards (a power of two)
+SEARCH_CACHE_SHARDS = 16
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_TTL_NS = SEARCH_CACHE_TTL * 1_000_000_000
+
+# IVF-PQ index settings: minimum corpus size worth training on, target recall
+# for the nprobe auto-tuner, and the queries sampled to measure it
+PQ_MIN_VECTORS = 10_000
+PQ_RECALL_TARGET = 0.9
+PQ_TUNING_QUERIES = 100
+
+# search_async coalesces queries arriving within BATCH_WINDOW seconds into one GEMM
+BATCH_WINDOW = 0.002
+BATCH_MAX_SIZE = 64
+
+# Number of recent searches kept in each thread's per-search stats columns
+STATS_CAPACITY = 65536
+
+# Semantic cache: recent unit-norm queries whose answers are reused by any
+# query at least SEMANTIC_CACHE_THRESHOLD cosine-similar to them
+SEMANTIC_CACHE_SIZE = 1024
+SEMANTIC_CACHE_THRESHOLD = 0.97
+
+def query_fingerprint(query_vector: np.ndarray) -> int:
+    """Cache fingerprint of a query
+    
+    Hashes the whole vector in place, with XXH3 when xxhash is installed and
+    an 8-byte BLAKE2b digest otherwise. Callers that reuse a query can compute this once
+    and pass it to optimized_search. The fingerprint only picks the cache
+    slot; a hit is confirmed against the stored query bytes.
+    """
+    query_bytes = memoryview(np.ascontiguousarray(query_vector)).cast('B')
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_64_intdigest(query_bytes)
+    return int.from_bytes(hashlib.blake2b(query_bytes, digest_size=8).digest(), 'little')
+
+@lru_cache(maxsize=8)
+def _topk_kernel(dim: int, k: int):
+    """Exact inner-product top-k kernel with dim and k fixed at compile time
+    
+    With both trip counts constant LLVM can unroll and vectorise the dot
+    product, and the running top-k insertion never allocates a score array.
+    Closures over dim and k cannot use Numba's on-disk cache, so each pair
+    compiles once per process. The kernel runs without the GIL, so searches
+    from concurrent threads scan in parallel.
+    """
+    @njit(nogil=True, fastmath=True, boundscheck=False)
+    def kernel(query, db):
+        best_ids = np.full(k, -1, dtype=np.int64)
+        best_scores = np.full(k, -np.inf, dtype=np.float32)
+        for row in range(db.shape[0]):
+            score = np.float32(0.0)
+            for j in range(dim):
+                score += db[row, j] * query[j]
+            if score > best_scores[k - 1]:
+                pos = k - 1
+                while pos > 0 and best_scores[pos - 1] < score:
+                    best_scores[pos] = best_scores[pos - 1]
+                    best_ids[pos] = best_ids[pos - 1]
+                    pos -= 1
+                best_scores[pos] = score
+                best_ids[pos] = row
+        return best_ids, best_scores
+    
+    return kernel
+
+class _SearchStats:
+    """Search counters and per-search stats columns written by one thread"""
+    
+    __slots__ = ('searches', 'cache_hits', 'n', 'search_t', 'cache_hit')
+    
     def __init__(self):
-        self.search_cache = {}
-        self.performance_stats = {
-            'searches_performed': 0,
-            'cache_hits': 0,
-            'avg_search_time': 0.0,
-            'optimization_ratio': 1.3  # 30% faster searches
-        }
-        self.lock = threading.Lock()
+        self.searches = 0
+        self.cache_hits = 0
+        # Rows ever written; the next one goes to n % STATS_CAPACITY
+        self.n = 0
+        self.search_t = np.zeros(STATS_CAPACITY, dtype=np.float32)
+        self.cache_hit = np.zeros(STATS_CAPACITY, dtype=np.bool_)
+
+class VectorSearchOptimizer:
+    def __init__(self, vectors: Optional[np.ndarray] = None, documents: Optional[List[str]] = None,
+                 use_pq: bool = False, semantic_cache: bool = False):
+        # Search cache shards, chosen by the low bits of the query fingerprint;
+        # each shard is its own LRU behind its own lock
+        self._cache_shards: List[OrderedDict] = [OrderedDict() for _ in range(SEARCH_CACHE_SHARDS)]
+        self._cache_locks: List[threading.Lock] = [threading.Lock() for _ in range(SEARCH_CACHE_SHARDS)]
+        # Each searching thread counts into its own _SearchStats, so stats are
+        # written and read without a lock; a thread registers its stats once
+        self._stats_local = threading.local()
+        self._thread_stats: List[_SearchStats] = []
+        self.lock = threading.Lock()  # Guards the semantic cache, the loaded database and stats registration
+        
+        # Semantic cache ring: one unit query vector per row, with its
+        # (top_k, results, timestamp) entry at the same index. Off by default:
+        # a near-duplicate query gets the cached query's results, which can
+        # differ from its own exact top-k
+        self.semantic_cache = semantic_cache
+        self._semantic_vectors: Optional[np.ndarray] = None
+        self._semantic_entries: List[Optional[Tuple[int, List[Dict[str, Any]], float]]] = []
+        self._semantic_head = 0
+        
+        self.db: Optional[np.ndarray] = None
+        self.db_i8: Optional[np.ndarray] = None
+        self.use_pq = use_pq
+        self.pq_index = None
+        self.documents: Optional[List[str]] = None
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        if vectors is not None:
+            self.load_vectors(vectors, documents)
+    
+    def load_vectors(self, vectors: np.ndarray, documents: Optional[List[str]] = None):
+        """Load the vector database searched by optimized_search
+        
+        Rows are L2-normalised into a C-contiguous float32 matrix so cosine
+        similarity is a single matrix-vector product and SimSIMD can take its
+        SIMD fast path.
+        """
+        db = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(db, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        db = np.ascontiguousarray(db / norms)
+        
+        db_i8 = None
+        pq_index = None
+        if self.use_pq and len(db) >= PQ_MIN_VECTORS:
+            if FAISS_AVAILABLE:
+                pq_index = self._build_pq_index(db)
+            else:
+                logger.warning("use_pq requested but faiss is not installed; using exact search")
+        if pq_index is None and SIMSIMD_AVAILABLE and len(db) >= INT8_MIN_VECTORS:
+            db_i8 = np.round(db * 127).astype(np.int8)
+        
+        with self.lock:
+            self.db = db
+            self.db_i8 = db_i8
+            self.pq_index = pq_index
+            self.documents = documents
+            for shard, shard_lock in zip(self._cache_shards, self._cache_locks):
+                with shard_lock:
+                    shard.clear()
+            self._semantic_vectors = None
+            self._semantic_entries = []
+            self._semantic_head = 0
+    
+    def _build_pq_index(self, db: np.ndarray):
+        """Train an OPQ + IVF-PQ index over the normalised database
+        
+        PQ codes are a fraction of the FP32 vectors' size, so a probe touches far
+        fewer bytes; the FP32 rows are kept only to rerank each shortlist.
+        """
+        dim = db.shape[1]
+        m = next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0 and m <= max(dim // 2, 1))
+        nlist = int(min(max(4 * np.sqrt(len(db)), 16), len(db) // 39))
+        index = faiss.index_factory(dim, f"OPQ{m},IVF{nlist},PQ{m}x8", faiss.METRIC_INNER_PRODUCT)
+        
+        rng = np.random.default_rng(0)
+        sample_size = min(len(db), max(nlist * 64, 65_536))
+        index.train(db[rng.choice(len(db), sample_size, replace=False)])
+        index.add(db)
+        
+        nprobe = self._tune_nprobe(index, db, nlist, rng)
+        logger.info(f"Built IVF-PQ index: nlist={nlist}, m={m}, nprobe={nprobe}")
+        return index
+    
+    @staticmethod
+    def _tune_nprobe(index, db: np.ndarray, nlist: int, rng: np.random.Generator, k: int = 10) -> int:
+        """Smallest power-of-two nprobe whose recall@k reaches PQ_RECALL_TARGET"""
+        queries = db[rng.choice(len(db), min(PQ_TUNING_QUERIES, len(db)), replace=False)]
+        exact = np.argpartition(-(queries @ db.T), k - 1, axis=1)[:, :k]
+        
+        parameter_space = faiss.ParameterSpace()
+        nprobe = 1
+        while True:
+            parameter_space.set_index_parameter(index, 'nprobe', nprobe)
+            if nprobe >= nlist:
+                return nprobe
+            _, approx = index.search(queries, k)
+            recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx.tolist(), exact.tolist())])
+            if recall >= PQ_RECALL_TARGET:
+                return nprobe
+            nprobe *= 2
     
-    def optimized_search(self, query_vector: np.ndarray, top_k: int = 5) -> Dict[str, Any]:
+    def optimized_search(self, query_vector: np.ndarray, top_k: int = 5,
+                         fingerprint: Optional[int] = None) -> Dict[str, Any]:
         """Optimized vector search with intelligent caching and pre-filtering"""
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         
-        # Create cache key
-        cache_key = f"{hash(query_vector.tobytes())}_{top_k}"
+        if fingerprint is None:
+            fingerprint = query_fingerprint(query_vector)
+        cache_key = (fingerprint, top_k)
         
         # Check cache first
-        with self.lock:
-            if cache_key in self.search_cache:
-                cached_result = self.search_cache[cache_key]
+        shard, shard_lock = self._cache_shard(fingerprint)
+        with shard_lock:
+            cached_result = shard.get(cache_key)
+            # A fingerprint collision must not return another query's results
+            if cached_result is not None and np.array_equal(cached_result['query'], query_vector):
                 # Check if cache entry is still fresh (5 minutes)
-                if time.time() - cached_result['timestamp'] < 300:
-                    self.performance_stats['cache_hits'] += 1
-                    logger.debug(f"Vector search cache hit: {cache_key}")
+                if time.monotonic_ns() - cached_result['timestamp'] < SEARCH_CACHE_TTL_NS:
+                    shard.move_to_end(cache_key)
+                    logger.debug("Vector search cache hit: %s", cache_key)
+                    search_time = round((time.perf_counter_ns() - start_time) / 1_000_000, 3)
+                    self._record_search(search_time, True)
                     return {
                         'results': cached_result['results'],
-                        'search_time': 0.01,  # Cached queries are very fast
+                        'search_time': search_time,
                         'cached': True,
                         'optimization_applied': True
                     }
+                del shard[cache_key]
         
-        # Perform optimized search
-        search_time = self._simulate_optimized_search(query_vector, top_k)
+        # Near-duplicate queries reuse the answer of a cached similar query
+        semantic_results = None
+        if self.semantic_cache:
+            unit_query = np.ascontiguousarray(query_vector, dtype=np.float32).reshape(-1)
+            norm = np.linalg.norm(unit_query)
+            if norm:
+                unit_query = unit_query / norm
+            semantic_results = self._semantic_lookup(unit_query, top_k)
+        if semantic_results is not None:
+            search_time = round((time.perf_counter_ns() - start_time) / 1_000_000, 3)
+            self._record_search(search_time, True)
+            return {
+                'results': semantic_results,
+                'search_time': search_time,
+                'cached': True,
+                'semantic_match': True,
+                'optimization_applied': True
+            }
         
-        # Simulate search results
+        # Perform optimized search
         results = [
-            {'id': i, 'score': 0.9 - (i * 0.1), 'content': f'Optimized result {i+1}'}
-            for i in range(min(top_k, 5))
+            {
+                'id': int(i),
+                'score': float(score),
+                'content': self.documents[i] if self.documents is not None else f'Result {i}'
+            }
+            for i, score in zip(*self._rank(query_vector, top_k))
         ]
+        search_time = round((time.perf_counter_ns() - start_time) / 1_000_000, 3)
         
         # Cache the results
-        with self.lock:
-            self.search_cache[cache_key] = {
+        with shard_lock:
+            shard[cache_key] = {
+                'query': np.array(query_vector, copy=True),
                 'results': results,
-                'timestamp': time.time()
+                'timestamp': time.monotonic_ns()
             }
-            
-            # Update performance stats
-            self.performance_stats['searches_performed'] += 1
-            self.performance_stats['avg_search_time'] = (
-                (self.performance_stats['avg_search_time'] * (self.performance_stats['searches_performed'] - 1) + search_time) / 
-                self.performance_stats['searches_performed']
-            )
+            shard.move_to_end(cache_key)
+            if len(shard) > SEARCH_CACHE_SIZE // SEARCH_CACHE_SHARDS:
+                shard.popitem(last=False)
+        if self.semantic_cache:
+            with self.lock:
+                self._semantic_store(unit_query, top_k, results)
+        
+        # Update performance stats
+        self._record_search(search_time, False)
         
         return {
             'results': results,
@@ -116,213 +357,452 @@ class VectorSearchOptimizer:
             'optimization_applied': True
         }
     
-    def _simulate_optimized_search(self, query_vector: np.ndarray, top_k: int) -> float:
-        """Simulate optimized search time (20% faster than baseline)"""
-        import random
-        # Baseline was ~90ms, optimized is ~72ms (20% improvement)
-        base_time = random.uniform(60, 85)  # Optimized range
-        optimization_factor = self.performance_stats['optimization_ratio']
-        return round(base_time / optimization_factor, 2)
+    def _cache_shard(self, fingerprint: int) -> Tuple[OrderedDict, threading.Lock]:
+        """Search cache shard and its lock for a query fingerprint"""
+        stripe = fingerprint & (SEARCH_CACHE_SHARDS - 1)
+        return self._cache_shards[stripe], self._cache_locks[stripe]
     
-    def get_stats(self) -> Dict[str, Any]:
-        """Get optimization statistics"""
+    def _semantic_lookup(self, unit_query: np.ndarray, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """Results of the most similar cached query, if it is similar and fresh enough"""
         with self.lock:
-            total_searches = self.performance_stats['searches_performed']
-            cache_hit_rate = (self.performance_stats['cache_hits'] / total_searches * 100) if total_searches > 0 else 0
+            count = min(self._semantic_head, SEMANTIC_CACHE_SIZE)
+            if not count or self._semantic_vectors.shape[1] != len(unit_query):
+                return None
             
-            return {
-                'total_searches': total_searches,
-                'cache_hits': self.performance_stats['cache_hits'],
-                'cache_hit_rate': round(cache_hit_rate, 2),
-                'avg_search_time': round(self.performance_stats['avg_search_time'], 2),
-                'performance_improvement': '20%',
-                'optimization_active': True
-            }
-
-# Global optimizer instance
-vector_optimizer = VectorSearchOptimizer()
-'''
-            
-            vector_file = self.phase2_dir / 'vector-optimization' / 'vector_optimizer.py'
-            vector_file.parent.mkdir(parents=True, exist_ok=True)
-            vector_file.write_text(vector_optimizer)
+            # One GEMV scores the query against every cached query
+            similarities = self._semantic_vectors[:count] @ unit_query
+            best = int(np.argmax(similarities))
+            if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+                return None
+            cached_top_k, results, timestamp = self._semantic_entries[best]
+            if cached_top_k < top_k or time.monotonic_ns() - timestamp >= SEARCH_CACHE_TTL_NS:
+                return None
+            return results[:top_k]
+    
+    def _semantic_store(self, unit_query: np.ndarray, top_k: int, results: List[Dict[str, Any]]):
+        """Add a query to the semantic cache, replacing the oldest once full; caller holds the lock"""
+        if self._semantic_vectors is None or self._semantic_vectors.shape[1] != len(unit_query):
+            self._semantic_vectors = np.zeros((SEMANTIC_CACHE_SIZE, len(unit_query)), dtype=np.float32)
+            self._semantic_entries = [None] * SEMANTIC_CACHE_SIZE
+            self._semantic_head = 0
+        
+        row = self._semantic_head % SEMANTIC_CACHE_SIZE
+        self._semantic_vectors[row] = unit_query
+        self._semantic_entries[row] = (top_k, results, time.monotonic_ns())
+        self._semantic_head += 1
+    
+    def _rank(self, query_vector: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and cosine scores of the top_k database rows, best first"""
+        db, db_i8, pq_index = self.db, self.db_i8, self.pq_index
+        if db is None or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        query = np.ascontiguousarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        top_k = min(top_k, len(db))
+        
+        if pq_index is not None:
+            # Approximate shortlist from the PQ codes, reranked exactly in FP32
+            shortlist = min(top_k * INT8_RERANK_FACTOR, len(db))
+            _, ids = pq_index.search(query.reshape(1, -1), shortlist)
+            candidates = ids[0][ids[0] >= 0]
+            candidate_scores = db[candidates] @ query
+        elif db_i8 is not None:
+            # Coarse ranking on int8 codes, then exact FP32 rerank of the shortlist
+            query_i8 = np.round(query * 127).astype(np.int8)
+            distances = np.asarray(simsimd.cdist(query_i8.reshape(1, -1), db_i8, metric="cosine")).reshape(-1)
+            shortlist = min(top_k * INT8_RERANK_FACTOR, len(db))
+            candidates = np.argpartition(distances, shortlist - 1)[:shortlist]
+            candidate_scores = db[candidates] @ query
+        elif SIMSIMD_AVAILABLE:
+            distances = np.asarray(simsimd.cdist(query.reshape(1, -1), db, metric="cosine")).reshape(-1)
+            candidates = np.argpartition(distances, top_k - 1)[:top_k]
+            candidate_scores = 1.0 - distances[candidates]
+        elif NUMBA_AVAILABLE:
+            # Kernel returns its top_k already sorted best first
+            return _topk_kernel(db.shape[1], top_k)(query, db)
+        else:
+            scores = db @ query
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidate_scores = scores[candidates]
+        
+        order = np.argsort(-candidate_scores)[:top_k]
+        return candidates[order], candidate_scores[order]
+    
+    def batch_search(self, queries: np.ndarray, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Exact top_k search for a batch of queries with a single matrix product
+        
+        Scoring the whole batch as one GEMM lets BLAS reuse each database tile
+        across every query instead of streaming the database once per query.
+        """
+        db = self.db
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if db is None or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ db.T
+        
+        top_k = min(top_k, len(db))
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        
+        return [
+            [
+                {
+                    'id': int(i),
+                    'score': float(score),
+                    'content': self.documents[i] if self.documents is not None else f'Result {i}'
+                }
+                for i, score in zip(row_ids.tolist(), row_scores.tolist())
+            ]
+            for row_ids, row_scores in zip(candidates, candidate_scores)
+        ]
+    
+    async def search_async(self, query_vector: np.ndarray, top_k: int = 5) -> Dict[str, Any]:
+        """Search from async code, batched with queries arriving at the same time"""
+        start_time = time.perf_counter_ns()
+        loop = asyncio.get_running_loop()
+        if self._batch_task is None or self._batch_task.done() or self._batch_task.get_loop() is not loop:
+            self._batch_queue = asyncio.Queue()
+            self._batch_task = loop.create_task(self._batch_loop(self._batch_queue))
+        
+        future = loop.create_future()
+        self._batch_queue.put_nowait((query_vector, top_k, future))
+        results, batch_size = await future
+        
+        return {
+            'results': results,
+            'search_time': round((time.perf_counter_ns() - start_time) / 1_000_000, 3),
+            'cached': False,
+            'batch_size': batch_size,
+            'optimization_applied': True
+        }
+    
+    async def _batch_loop(self, batch_queue: asyncio.Queue):
+        """Collect queued queries into micro-batches and answer them together"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await batch_queue.get()]
+            deadline = loop.time() + BATCH_WINDOW
+            while len(batch) < BATCH_MAX_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
             
-            logger.info("✅ Vector search optimization deployed")
-            self.success_count += 1
-            return True
+            try:
+                batch_results = self.batch_search(
+                    np.stack([query for query, _, _ in batch]),
+                    max(top_k for _, top_k, _ in batch)
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
             
-        except Exception as e:
-            logger.error(f"❌ Failed to deploy vector optimization: {e}")
-            return False
+            for (_, top_k, future), results in zip(batch, batch_results):
+                if not future.done():
+                    future.set_result((results[:top_k], len(batch)))
     
-    def deploy_concurrency_layer(self):
-        """Deploy async concurrency improvements"""
-        try:
-            logger.info("🎯 Deploying concurrency enhancements...")
-            
-            concurrency_layer = '''
+    def _search_stats(self) -> _SearchStats:
+        """Stats owned by the calling thread"""
+        stats = getattr(self._stats_local, 'stats', None)
+        if stats is None:
+            stats = self._stats_local.stats = _SearchStats()
+            with self.lock:
+                self._thread_stats.append(stats)
+        return stats
+    
+    def _record_search(self, search_time: float, cached: bool):
+        """Count one search and write it into this thread's stats ring"""
+        stats = self._search_stats()
+        i = stats.n % STATS_CAPACITY
+        stats.search_t[i] = search_time
+        stats.cache_hit[i] = cached
+        stats.n += 1
+        if cached:
+            stats.cache_hits += 1
+        else:
+            stats.searches += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get optimization statistics
+        
+        Reads every thread's stats without a lock; each has a single writer,
+        so a search running concurrently can only skew its own newest row.
+        """
+        thread_stats = list(self._thread_stats)
+        total_searches = sum(stats.searches for stats in thread_stats)
+        cache_hits = sum(stats.cache_hits for stats in thread_stats)
+        lookups = total_searches + cache_hits
+        cache_hit_rate = (cache_hits / lookups * 100) if lookups > 0 else 0
+        
+        # Vectorised over each thread's retained window; averages cover uncached searches
+        windows = [min(stats.n, STATS_CAPACITY) for stats in thread_stats]
+        search_times = np.concatenate([
+            stats.search_t[:n][~stats.cache_hit[:n]] for stats, n in zip(thread_stats, windows)
+        ] or [np.empty(0, dtype=np.float32)])
+        
+        return {
+            'total_searches': total_searches,
+            'cache_hits': cache_hits,
+            'cache_hit_rate': round(cache_hit_rate, 2),
+            'avg_search_time': round(float(search_times.mean()), 2) if len(search_times) else 0.0,
+            'search_time_std': round(float(search_times.std()), 2) if len(search_times) else 0.0,
+            'performance_improvement': '20%',
+            'optimization_active': True
+        }
+
+# Global optimizer instance
+vector_optimizer = VectorSearchOptimizer()
+'''.encode('utf-8')
+
+# Async concurrency layer module
+CONCURRENCY_LAYER_SRC = '''
 # Async Concurrency Layer
 # Enhanced request handling with connection pooling
 
 import asyncio
+import json
+import math
 import time
-from typing import Dict, Any, List
-import threading
-from concurrent.futures import ThreadPoolExecutor
-import queue
+import logging
+from typing import Dict, Any, List, Optional
+import aiohttp
+import numpy as np
+
+# orjson serialises stats payloads straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Simulated processing time range (ms) per request type
+SIMULATED_TIMES = {
+    'query': (40, 60),  # Query processing: 50ms with concurrency optimization
+    'upload': (150, 250),  # File upload: 200ms with concurrent processing
+}
+SIMULATED_DEFAULT_TIME = (20, 40)  # General requests: 30ms
+
+# Log-spaced latency buckets (HdrHistogram style): 5% wide from 10us to 60s
+LATENCY_MIN_MS = 0.01
+LATENCY_MAX_MS = 60_000.0
+LATENCY_GROWTH = 1.05
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+    return json.dumps(data).encode('utf-8')
+
+class LatencyHistogram:
+    """Fixed-size log-bucket histogram of request latencies in milliseconds
+    
+    Recording is one bucket increment; quantiles are read from the bucket CDF
+    and are accurate to within one bucket (about 5% relative error).
+    """
+    
+    def __init__(self):
+        self.log_growth = math.log(LATENCY_GROWTH)
+        num_buckets = math.ceil(math.log(LATENCY_MAX_MS / LATENCY_MIN_MS) / self.log_growth) + 1
+        # Representative value per bucket: geometric midpoint of its bounds
+        self.bucket_values = LATENCY_MIN_MS * np.power(LATENCY_GROWTH, np.arange(num_buckets) + 0.5)
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+    
+    def record(self, value_ms: float):
+        """Count one latency sample"""
+        if value_ms <= LATENCY_MIN_MS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(value_ms / LATENCY_MIN_MS) / self.log_growth), len(self.counts) - 1)
+        self.counts[bucket] += 1
+    
+    def quantiles(self, qs: List[float]) -> Optional[List[float]]:
+        """Approximate quantiles (0..1) of everything recorded so far"""
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1]
+        if not total:
+            return None
+        ranks = np.ceil(np.asarray(qs) * total).clip(1, total)
+        return [float(v) for v in self.bucket_values[np.searchsorted(cumulative, ranks, side='left')]]
 
 class ConcurrencyManager:
     def __init__(self, max_workers: int = 8, max_queue_size: int = 100):
         self.max_workers = max_workers
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.request_queue = queue.Queue(maxsize=max_queue_size)
+        self.max_queue_size = max_queue_size
+        # Requests beyond max_workers wait on the semaphore; beyond that backlog they are rejected
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self.session: Optional[aiohttp.ClientSession] = None
         self.active_requests = 0
         self.completed_requests = 0
         self.failed_requests = 0
         self.total_processing_time = 0.0
-        self.lock = threading.Lock()
+        self.latency_histogram = LatencyHistogram()
         self.start_time = time.time()
-        
-        # Start background processing
-        self._start_workers()
+        self._start_monotonic = time.monotonic()
+        self._rng = np.random.default_rng()
     
-    def _start_workers(self):
-        """Start background worker threads"""
-        for i in range(min(4, self.max_workers)):  # Start with 4 workers
-            worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            worker_thread.start()
+    async def start(self):
+        """Open the shared keep-alive session used for downstream calls"""
+        if self.session is None or self.session.closed:
+            self.connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=30, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                connector=self.connector,
+                timeout=aiohttp.ClientTimeout(total=30, connect=10)
+            )
+        return self.session
     
-    def _worker_loop(self):
-        """Background worker for processing requests"""
-        while True:
-            try:
-                request_data = self.request_queue.get(timeout=1.0)
-                self._process_request(request_data)
-                self.request_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Worker error: {e}")
+    async def close(self):
+        """Close the shared session and its connection pool"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.connector = None
     
-    def _process_request(self, request_data: Dict[str, Any]):
-        """Process a single request"""
-        start_time = time.time()
+    async def _process_async(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a single request on the event loop"""
+        start_ns = time.perf_counter_ns()
+        self.active_requests += 1
         
         try:
-            with self.lock:
-                self.active_requests += 1
+            async with self.semaphore:
+                if 'url' in request_data:
+                    status = await self._forward_request(request_data)
+                    processing_time = (time.perf_counter_ns() - start_ns) / 1_000_000
+                else:
+                    status = None
+                    processing_time = await self._simulate_concurrent_processing(request_data)
             
-            # Simulate request processing with improved concurrency
-            processing_time = self._simulate_concurrent_processing(request_data)
-            
-            with self.lock:
-                self.active_requests -= 1
-                self.completed_requests += 1
-                self.total_processing_time += processing_time
+            self.completed_requests += 1
+            self.total_processing_time += processing_time
+            self.latency_histogram.record(processing_time)
             
+            return {
+                'processing_time': processing_time,
+                'processed_at': time.time(),
+                'status_code': status,
+                'optimized': True
+            }
+        
         except Exception as e:
-            with self.lock:
-                self.active_requests -= 1
-                self.failed_requests += 1
+            self.failed_requests += 1
             logger.error(f"Request processing failed: {e}")
+            raise
+        
+        finally:
+            self.active_requests -= 1
     
-    def _simulate_concurrent_processing(self, request_data: Dict[str, Any]) -> float:
+    async def _forward_request(self, request_data: Dict[str, Any]) -> int:
+        """Send the request downstream over the pooled session"""
+        session = await self.start()
+        async with session.request(
+            request_data.get('method', 'GET'),
+            request_data['url'],
+            json=request_data.get('payload')
+        ) as response:
+            await response.read()
+            return response.status
+    
+    async def _simulate_concurrent_processing(self, request_data: Dict[str, Any]) -> float:
         """Simulate optimized concurrent request processing"""
-        import random
-        
-        # Simulate different types of requests
-        request_type = request_data.get('type', 'query')
-        
-        if request_type == 'query':
-            # Query processing: 50ms with concurrency optimization
-            base_time = random.uniform(40, 60)
-        elif request_type == 'upload':
-            # File upload: 200ms with concurrent processing
-            base_time = random.uniform(150, 250)
-        else:
-            # General requests: 30ms
-            base_time = random.uniform(20, 40)
+        low, high = SIMULATED_TIMES.get(request_data.get('type', 'query'), SIMULATED_DEFAULT_TIME)
+        base_time = float(self._rng.uniform(low, high))
         
-        # Simulate processing
-        time.sleep(base_time / 1000)  # Convert to seconds
+        # Simulate processing without blocking the event loop
+        await asyncio.sleep(base_time / 1000)  # Convert to seconds
         return base_time
     
     async def handle_async_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle request asynchronously"""
-        loop = asyncio.get_event_loop()
-        
-        # Submit to thread pool for processing
-        future = loop.run_in_executor(self.executor, self._process_sync_request, request_data)
+        if self.active_requests >= self.max_workers + self.max_queue_size:
+            return {
+                'status': 'rejected',
+                'error': 'Request queue full',
+                'concurrent_processing': True
+            }
         
         try:
-            result = await asyncio.wait_for(future, timeout=10.0)  # 10 second timeout
+            result = await asyncio.wait_for(self._process_async(request_data), timeout=10.0)  # 10 second timeout
             return {
                 'status': 'success',
                 'result': result,
                 'concurrent_processing': True
             }
         except asyncio.TimeoutError:
+            self.failed_requests += 1
             return {
                 'status': 'timeout',
                 'error': 'Request processing timeout',
                 'concurrent_processing': True
             }
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e),
+                'concurrent_processing': True
+            }
     
-    def _process_sync_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Synchronous request processing"""
-        processing_time = self._simulate_concurrent_processing(request_data)
+    async def handle_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fan a batch of requests out concurrently and collect results in order"""
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.handle_async_request(request_data)) for request_data in requests]
+        return [task.result() for task in tasks]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get concurrency statistics"""
+        uptime = time.monotonic() - self._start_monotonic
+        avg_processing_time = (self.total_processing_time / self.completed_requests
+                             if self.completed_requests > 0 else 0)
+        
+        throughput = self.completed_requests / uptime if uptime > 0 else 0
+        p50, p95, p99 = self.latency_histogram.quantiles([0.5, 0.95, 0.99]) or (0.0, 0.0, 0.0)
         
         return {
-            'processing_time': processing_time,
-            'processed_at': time.time(),
-            'optimized': True
+            'active_requests': self.active_requests,
+            'completed_requests': self.completed_requests,
+            'failed_requests': self.failed_requests,
+            'success_rate': round((self.completed_requests / (self.completed_requests + self.failed_requests) * 100)
+                                if (self.completed_requests + self.failed_requests) > 0 else 100, 2),
+            'avg_processing_time': round(avg_processing_time, 2),
+            'p50_processing_time': round(p50, 2),
+            'p95_processing_time': round(p95, 2),
+            'p99_processing_time': round(p99, 2),
+            'throughput_per_second': round(throughput, 2),
+            'max_concurrent_users': 150,  # Enhanced capacity
+            'optimization_active': True
         }
     
-    def get_stats(self) -> Dict[str, Any]:
-        """Get concurrency statistics"""
-        with self.lock:
-            uptime = time.time() - self.start_time
-            avg_processing_time = (self.total_processing_time / self.completed_requests 
-                                 if self.completed_requests > 0 else 0)
-            
-            throughput = self.completed_requests / uptime if uptime > 0 else 0
-            
-            return {
-                'active_requests': self.active_requests,
-                'completed_requests': self.completed_requests,
-                'failed_requests': self.failed_requests,
-                'success_rate': round((self.completed_requests / (self.completed_requests + self.failed_requests) * 100) 
-                                    if (self.completed_requests + self.failed_requests) > 0 else 100, 2),
-                'avg_processing_time': round(avg_processing_time, 2),
-                'throughput_per_second': round(throughput, 2),
-                'max_concurrent_users': 150,  # Enhanced capacity
-                'optimization_active': True
-            }
+    def get_stats_json(self) -> bytes:
+        """Concurrency statistics encoded for an HTTP response body"""
+        return dumps_json(self.get_stats())
 
 # Global concurrency manager
 concurrency_manager = ConcurrencyManager(max_workers=8)
-'''
-            
-            concurrency_file = self.phase2_dir / 'concurrency' / 'concurrency_manager.py'
-            concurrency_file.parent.mkdir(parents=True, exist_ok=True)
-            concurrency_file.write_text(concurrency_layer)
-            
-            logger.info("✅ Concurrency layer deployed")
-            self.success_count += 1
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to deploy concurrency layer: {e}")
-            return False
-    
-    def deploy_ui_optimizations(self):
-        """Deploy frontend UI optimizations"""
-        try:
-            logger.info("🎯 Deploying UI performance optimizations...")
-            
-            # Create an enhanced UI file with performance optimizations
-            ui_optimizations = '''
+'''.encode('utf-8')
+
+# Enhanced UI file with performance optimizations
+UI_OPTIMIZATIONS_SRC = '''
 <!-- Enhanced UI Performance Optimizations -->
+<link rel="prefetch" href="/static/dashboard.html">
+<link rel="prefetch" href="/health">
 <script>
 // UI Performance Optimizer
 class UIPerformanceOptimizer {
@@ -335,6 +815,13 @@ class UIPerformanceOptimizer {
         };
         this.optimizationsActive = true;
         
+        // Analytics events are queued here and sent in batches
+        this.analyticsOutbox = [];
+        
+        // Result markup is parsed once here and cloned per result
+        this.resultTemplate = document.createElement('template');
+        this.resultTemplate.innerHTML = '<div class="optimized-result"><div class="result-content"></div><div class="performance-info"></div></div>';
+        
         this.init();
     }
     
@@ -353,19 +840,8 @@ class UIPerformanceOptimizer {
     }
     
     optimizePageLoad() {
-        // Preload critical resources
-        const criticalResources = [
-            '/static/dashboard.html',
-            '/health',
-            '/ui'
-        ];
-        
-        criticalResources.forEach(resource => {
-            const link = document.createElement('link');
-            link.rel = 'prefetch';
-            link.href = resource;
-            document.head.appendChild(link);
-        });
+        // Critical resources are hinted statically (and by the /ui Link header)
+        // so the preload scanner fetches them before this script runs
         
         // Lazy load non-critical components
         this.setupLazyLoading();
@@ -402,54 +878,90 @@ class UIPerformanceOptimizer {
     }
     
     addVirtualScrolling(container) {
-        // Simple virtual scrolling implementation
-        let visibleItems = [];
+        // Windowed virtual list: only maxVisible rows stay in the DOM, absolutely
+        // positioned and re-bound to other items as the window moves
+        const items = Array.from(container.children);
         const itemHeight = 60; // Estimated item height
-        const containerHeight = container.clientHeight;
-        const maxVisible = Math.ceil(containerHeight / itemHeight) + 2; // Buffer
+        const maxVisible = Math.ceil(container.clientHeight / itemHeight) + 2; // Buffer
+        if (items.length <= maxVisible) {
+            return;
+        }
         
-        container.addEventListener('scroll', () => {
-            const scrollTop = container.scrollTop;
-            const startIndex = Math.floor(scrollTop / itemHeight);
-            const endIndex = Math.min(startIndex + maxVisible, container.children.length);
+        // Spacer keeps the full scroll height while holding only the pooled rows
+        const spacer = document.createElement('div');
+        spacer.style.position = 'relative';
+        spacer.style.height = `${items.length * itemHeight}px`;
+        container.replaceChildren(spacer);
+        
+        const pool = Array.from({ length: maxVisible }, () => {
+            const row = document.createElement('div');
+            row.style.position = 'absolute';
+            row.style.left = '0';
+            row.style.right = '0';
+            row.style.height = `${itemHeight}px`;
+            spacer.appendChild(row);
+            return row;
+        });
+        
+        let frameRequested = false;
+        const render = () => {
+            frameRequested = false;
+            const startIndex = Math.min(Math.floor(container.scrollTop / itemHeight), items.length - maxVisible);
             
-            // Hide non-visible items
-            for (let i = 0; i < container.children.length; i++) {
-                const item = container.children[i];
-                if (i >= startIndex && i <= endIndex) {
-                    item.style.display = 'block';
-                } else {
-                    item.style.display = 'none';
+            pool.forEach((row, i) => {
+                const index = startIndex + i;
+                row.style.transform = `translateY(${index * itemHeight}px)`;
+                if (row.firstChild !== items[index]) {
+                    row.replaceChildren(items[index]);
                 }
+            });
+        };
+        
+        // At most one re-bind per frame, however many scroll events fire
+        container.addEventListener('scroll', () => {
+            if (!frameRequested) {
+                frameRequested = true;
+                requestAnimationFrame(render);
             }
-        });
+        }, { passive: true });
+        
+        render();
     }
     
     optimizeFormHandling() {
-        // Debounce form inputs
+        // Run queries when the browser is idle (at most 300ms later) and abort
+        // the previous query on every keystroke so stale results never render
         const inputs = document.querySelectorAll('input[type="text"], textarea');
+        const scheduleIdle = window.requestIdleCallback
+            ? (callback) => window.requestIdleCallback(callback, { timeout: 300 })
+            : (callback) => setTimeout(callback, 300);
+        const cancelIdle = window.cancelIdleCallback || clearTimeout;
         
         inputs.forEach(input => {
-            let timeout;
+            let controller;
+            let idleHandle;
             input.addEventListener('input', (e) => {
-                clearTimeout(timeout);
-                timeout = setTimeout(() => {
-                    this.handleOptimizedInput(e.target);
-                }, 300); // 300ms debounce
+                controller?.abort();
+                cancelIdle(idleHandle);
+                controller = new AbortController();
+                const signal = controller.signal;
+                idleHandle = scheduleIdle(() => {
+                    this.handleOptimizedInput(e.target, signal);
+                });
             });
         });
     }
     
-    handleOptimizedInput(input) {
+    handleOptimizedInput(input, signal) {
         // Optimized input handling with caching
         const value = input.value.trim();
         if (value.length > 2) {
             // Trigger optimized search/processing
-            this.triggerOptimizedQuery(value);
+            this.triggerOptimizedQuery(value, signal);
         }
     }
     
-    async triggerOptimizedQuery(query) {
+    async triggerOptimizedQuery(query, signal) {
         // Enhanced query with performance optimization
         const startTime = performance.now();
         
@@ -463,7 +975,8 @@ class UIPerformanceOptimizer {
                     query: query,
                     optimization_level: 'phase2',
                     ui_optimized: true
-                })
+                }),
+                signal: signal
             });
             
             const result = await response.json();
@@ -473,6 +986,9 @@ class UIPerformanceOptimizer {
             this.renderOptimizedResults(result, queryTime);
             
         } catch (error) {
+            if (error.name === 'AbortError') {
+                return; // Superseded by a newer keystroke
+            }
             console.error('Optimized query failed:', error);
         }
     }
@@ -485,14 +1001,10 @@ class UIPerformanceOptimizer {
         const fragment = document.createDocumentFragment();
         
         if (results.answer) {
-            const resultDiv = document.createElement('div');
-            resultDiv.className = 'optimized-result';
-            resultDiv.innerHTML = `
-                <div class="result-content">${results.answer}</div>
-                <div class="performance-info">
-                    Query processed in ${queryTime.toFixed(2)}ms (Phase 2 Optimized ⚡)
-                </div>
-            `;
+            const resultDiv = this.resultTemplate.content.firstElementChild.cloneNode(true);
+            resultDiv.querySelector('.result-content').textContent = results.answer;
+            resultDiv.querySelector('.performance-info').textContent =
+                `Query processed in ${queryTime.toFixed(2)}ms (Phase 2 Optimized ⚡)`;
             fragment.appendChild(resultDiv);
         }
         
@@ -514,6 +1026,16 @@ class UIPerformanceOptimizer {
         setInterval(() => {
             this.recordCustomMetrics();
         }, 5000); // Every 5 seconds
+        
+        // Ship queued analytics periodically and whenever the page is hidden
+        setInterval(() => {
+            this.flushAnalytics();
+        }, 10000); // Every 10 seconds
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flushAnalytics();
+            }
+        });
     }
     
     recordMetric(metric) {
@@ -542,16 +1064,32 @@ class UIPerformanceOptimizer {
         });
     }
     
-    async sendToAnalytics(data) {
+    sendToAnalytics(data) {
+        this.analyticsOutbox.push(data);
+    }
+    
+    flushAnalytics() {
+        if (!this.analyticsOutbox.length) {
+            return;
+        }
+        
+        // One request per batch; sendBeacon survives page unload without blocking
+        const body = JSON.stringify(this.analyticsOutbox);
+        this.analyticsOutbox.length = 0;
+        
         try {
-            // Send to local analytics endpoint
-            await fetch('/api/v1/optimization/analytics', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(data)
-            });
+            const queued = navigator.sendBeacon &&
+                navigator.sendBeacon('/api/v1/optimization/analytics', new Blob([body], { type: 'application/json' }));
+            if (!queued) {
+                fetch('/api/v1/optimization/analytics', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: body,
+                    keepalive: true
+                }).catch(error => console.debug('Analytics endpoint not available:', error));
+            }
         } catch (error) {
             console.debug('Analytics endpoint not available:', error);
         }
@@ -623,135 +1161,224 @@ if (document.readyState === 'loading') {
     font-weight: 600;
 }
 </style>
-'''
-            
-            ui_file = self.phase2_dir / 'frontend' / 'ui_optimizations.html'
-            ui_file.parent.mkdir(parents=True, exist_ok=True)
-            ui_file.write_text(ui_optimizations)
-            
-            logger.info("✅ UI optimizations deployed")
-            self.success_count += 1
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to deploy UI optimizations: {e}")
-            return False
-    
-    def deploy_enhanced_monitoring(self):
-        """Deploy enhanced monitoring for Phase 2"""
-        try:
-            logger.info("🎯 Deploying enhanced monitoring...")
-            
-            enhanced_monitoring = '''
+'''.encode('utf-8')
+
+# Enhanced monitoring module
+ENHANCED_MONITORING_SRC = '''
 # Enhanced Monitoring for Phase 2
 # Advanced metrics collection and analysis
 
 import time
+import logging
 import threading
 from typing import Dict, Any, List
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
+import numpy as np
+
+# Numba compiles the summary reduction when installed; NumPy is the fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+# orjson serialises metric payloads straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Seconds between phase2 metric collections, and the cap for error backoff
+COLLECTION_INTERVAL = 10
+MAX_ERROR_BACKOFF = 60
+
+# Number of samples retained per metric series
+METRICS_HISTORY_SIZE = 100
+
+# Number of recent phase2 samples averaged by get_phase2_summary
+SUMMARY_WINDOW_SIZE = 10
+
+# Columns of the phase2 sample ring buffer
+PHASE2_FIELDS = ('timestamp', 'vector_search_time', 'concurrent_capacity', 'ui_response_time', 'cache_efficiency')
+
+# Event counters bumped by the lock-free record_* methods
+EVENT_COUNTERS = ('vector_optimizations', 'concurrent_requests', 'ui_interactions')
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC)
+    return json.dumps(data).encode('utf-8')
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _window_mean(buf, head, window):
+        """Column means of the last window rows written to a ring buffer"""
+        size = buf.shape[0]
+        n = min(head, window, size)
+        sums = np.zeros(buf.shape[1])
+        for k in range(n):
+            row = (head - 1 - k) % size
+            for col in range(buf.shape[1]):
+                sums[col] += buf[row, col]
+        return sums / n
+else:
+    def _window_mean(buf: np.ndarray, head: int, window: int) -> np.ndarray:
+        """Column means of the last window rows written to a ring buffer"""
+        n = min(head, window, buf.shape[0])
+        rows = (head - 1 - np.arange(n)) % buf.shape[0]
+        return buf[rows].mean(axis=0)
 
 class EnhancedMonitor:
     def __init__(self):
-        self.metrics = defaultdict(list)
+        self.metrics = defaultdict(lambda: deque(maxlen=METRICS_HISTORY_SIZE))
+        # Create the recorder series up front so appends never race on insertion
+        for key in ('vector_searches', 'concurrent_requests', 'ui_interactions'):
+            self.metrics[key]
+        
+        # Phase2 samples live in a preallocated ring, one row per sample
+        self._phase2_buf = np.zeros((METRICS_HISTORY_SIZE, len(PHASE2_FIELDS)), dtype=np.float64)
+        self._phase2_head = 0  # Total samples written; next row is head % size
+        
+        # Each recording thread bumps its own counters without a lock and
+        # registers them once; readers sum every thread's counters
+        self._local = threading.local()
+        self._thread_counters: List[Dict[str, int]] = []
         self.phase2_stats = {
-            'vector_optimizations': 0,
-            'concurrent_requests': 0,
-            'ui_interactions': 0,
             'performance_boost': 0.0
         }
+        # Private PCG64 generator; draws never touch the shared random module state
+        self._rng = np.random.default_rng()
         self.start_time = time.time()
-        self.lock = threading.Lock()
+        self._start_ns = time.monotonic_ns()
+        self.lock = threading.RLock()
         
         # Start monitoring thread
+        self._stop = threading.Event()
         self.monitoring_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitoring_thread.start()
     
     def _monitor_loop(self):
         """Background monitoring loop"""
-        while True:
+        consecutive_errors = 0
+        while not self._stop.is_set():
+            delay = COLLECTION_INTERVAL
             try:
                 self.collect_phase2_metrics()
-                time.sleep(10)  # Collect metrics every 10 seconds
-            except Exception as e:
-                print(f"Monitoring error: {e}")
+                consecutive_errors = 0
+            except Exception:
+                consecutive_errors += 1
+                logger.exception("Monitoring error")
+                # Back off exponentially after repeated failures
+                if consecutive_errors >= 3:
+                    delay = min(COLLECTION_INTERVAL * 2 ** (consecutive_errors - 2), MAX_ERROR_BACKOFF)
+            
+            self._stop.wait(delay)
+    
+    def stop(self):
+        """Stop the background monitoring thread"""
+        self._stop.set()
     
     def collect_phase2_metrics(self):
         """Collect Phase 2 specific metrics"""
+        current_time = time.time()
+        
+        # Simulate Phase 2 performance metrics; drawn before taking the lock
+        vector_search_time, ui_response_time, cache_efficiency = self._rng.uniform(
+            (55, 20, 75),  # Optimized search time, faster UI, better caching
+            (75, 40, 85)
+        ).tolist()
+        concurrent_capacity = int(self._rng.integers(120, 150, endpoint=True))  # Enhanced concurrency
+        
         with self.lock:
-            current_time = time.time()
-            
-            # Simulate Phase 2 performance metrics
-            import random
-            
-            metrics = {
-                'timestamp': current_time,
-                'vector_search_time': random.uniform(55, 75),  # Optimized search time
-                'concurrent_capacity': random.randint(120, 150),  # Enhanced concurrency
-                'ui_response_time': random.uniform(20, 40),  # Faster UI
-                'cache_efficiency': random.uniform(75, 85),  # Better caching
-                'optimization_factor': 1.5,  # 50% total improvement
-                'phase': 'phase2'
-            }
-            
-            self.metrics['phase2'].append(metrics)
-            
-            # Keep only recent metrics (last 100 entries)
-            if len(self.metrics['phase2']) > 100:
-                self.metrics['phase2'] = self.metrics['phase2'][-100:]
+            # Overwrites the oldest row once the ring is full
+            self._phase2_buf[self._phase2_head % METRICS_HISTORY_SIZE] = (
+                current_time,
+                vector_search_time,
+                concurrent_capacity,
+                ui_response_time,
+                cache_efficiency
+            )
+            self._phase2_head += 1
             
             # Update phase 2 stats
             self.phase2_stats['performance_boost'] = (
-                (90 - metrics['vector_search_time']) / 90 * 100  # % improvement from baseline
+                (90 - vector_search_time) / 90 * 100  # % improvement from baseline
             )
     
+    def _phase2_samples(self) -> List[Dict[str, Any]]:
+        """Phase2 samples in the ring, oldest first"""
+        size = min(self._phase2_head, METRICS_HISTORY_SIZE)
+        rows = (self._phase2_head - size + np.arange(size)) % METRICS_HISTORY_SIZE
+        samples = []
+        for row in self._phase2_buf[rows].tolist():
+            sample = dict(zip(PHASE2_FIELDS, row))
+            sample['concurrent_capacity'] = int(sample['concurrent_capacity'])
+            sample['optimization_factor'] = 1.5  # 50% total improvement
+            sample['phase'] = 'phase2'
+            samples.append(sample)
+        return samples
+    
     def record_vector_optimization(self, search_time: float, cached: bool = False):
         """Record vector search optimization event"""
-        with self.lock:
-            self.phase2_stats['vector_optimizations'] += 1
-            self.metrics['vector_searches'].append({
-                'timestamp': time.time(),
-                'search_time': search_time,
-                'cached': cached,
-                'optimized': True
-            })
+        self._counters()['vector_optimizations'] += 1
+        self.metrics['vector_searches'].append({
+            'timestamp': time.time(),
+            'search_time': search_time,
+            'cached': cached,
+            'optimized': True
+        })
     
     def record_concurrent_request(self, processing_time: float, success: bool = True):
         """Record concurrent request handling"""
-        with self.lock:
-            self.phase2_stats['concurrent_requests'] += 1
-            self.metrics['concurrent_requests'].append({
-                'timestamp': time.time(),
-                'processing_time': processing_time,
-                'success': success,
-                'concurrent_handling': True
-            })
+        self._counters()['concurrent_requests'] += 1
+        self.metrics['concurrent_requests'].append({
+            'timestamp': time.time(),
+            'processing_time': processing_time,
+            'success': success,
+            'concurrent_handling': True
+        })
     
     def record_ui_interaction(self, interaction_type: str, response_time: float):
         """Record UI interaction optimization"""
-        with self.lock:
-            self.phase2_stats['ui_interactions'] += 1
-            self.metrics['ui_interactions'].append({
-                'timestamp': time.time(),
-                'type': interaction_type,
-                'response_time': response_time,
-                'optimized': True
-            })
+        self._counters()['ui_interactions'] += 1
+        self.metrics['ui_interactions'].append({
+            'timestamp': time.time(),
+            'type': interaction_type,
+            'response_time': response_time,
+            'optimized': True
+        })
+    
+    def _counters(self) -> Dict[str, int]:
+        """Event counters owned by the calling thread"""
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = dict.fromkeys(EVENT_COUNTERS, 0)
+            with self.lock:
+                self._thread_counters.append(counters)
+        return counters
+    
+    def _event_counts(self) -> Dict[str, int]:
+        """Event counters summed over every recording thread; call with self.lock held"""
+        return {name: sum(counters[name] for counters in self._thread_counters) for name in EVENT_COUNTERS}
     
     def get_phase2_summary(self) -> Dict[str, Any]:
         """Get Phase 2 performance summary"""
         with self.lock:
-            uptime = time.time() - self.start_time
-            
-            # Calculate averages from recent metrics
-            recent_metrics = self.metrics['phase2'][-10:] if self.metrics['phase2'] else []
+            uptime = (time.monotonic_ns() - self._start_ns) / 1_000_000_000
             
-            if recent_metrics:
-                avg_vector_time = sum(m['vector_search_time'] for m in recent_metrics) / len(recent_metrics)
-                avg_concurrent_capacity = sum(m['concurrent_capacity'] for m in recent_metrics) / len(recent_metrics)
-                avg_ui_time = sum(m['ui_response_time'] for m in recent_metrics) / len(recent_metrics)
-                avg_cache_efficiency = sum(m['cache_efficiency'] for m in recent_metrics) / len(recent_metrics)
+            if self._phase2_head:
+                # One reduction over the ring for every column
+                (_, avg_vector_time, avg_concurrent_capacity,
+                 avg_ui_time, avg_cache_efficiency) = _window_mean(
+                    self._phase2_buf, self._phase2_head, SUMMARY_WINDOW_SIZE
+                ).tolist()
             else:
                 avg_vector_time = 65.0
                 avg_concurrent_capacity = 135
@@ -767,11 +1394,7 @@ class EnhancedMonitor:
                     'avg_ui_response_time': round(avg_ui_time, 2),
                     'cache_efficiency_percent': round(avg_cache_efficiency, 2)
                 },
-                'optimization_stats': {
-                    'vector_optimizations': self.phase2_stats['vector_optimizations'],
-                    'concurrent_requests': self.phase2_stats['concurrent_requests'],
-                    'ui_interactions': self.phase2_stats['ui_interactions']
-                },
+                'optimization_stats': self._event_counts(),
                 'performance_boost': f"{round(self.phase2_stats['performance_boost'], 1)}%",
                 'status': 'optimal'
             }
@@ -781,18 +1404,117 @@ class EnhancedMonitor:
         with self.lock:
             return {
                 'collection_time': time.time(),
-                'metrics': dict(self.metrics),
-                'phase2_stats': self.phase2_stats,
+                'metrics': {
+                    'phase2': self._phase2_samples(),
+                    **{key: list(values) for key, values in self.metrics.items()}
+                },
+                'phase2_stats': {**self._event_counts(), **self.phase2_stats},
                 'summary': self.get_phase2_summary()
             }
+    
+    def get_full_metrics_json(self) -> bytes:
+        """Complete metrics dump encoded for an HTTP response body"""
+        return dumps_json(self.get_full_metrics())
 
 # Global enhanced monitor
 enhanced_monitor = EnhancedMonitor()
-'''
+'''.encode('utf-8')
+
+class SimplePhase2Deployer:
+    """Phase 2 enhancements deployment"""
+    
+    def __init__(self):
+        self.base_dir = Path('/home/shu/Developer/ProjektSusui/ProjectSusi-main')
+        self.phase2_dir = self.base_dir / 'website' / 'phase2-rag'
+        self.success_count = 0
+        self.total_components = 4
+        self._created_dirs = set()  # Directories already ensured during this deploy
+        
+    def check_phase1_status(self):
+        """Verify Phase 1 is running successfully"""
+        if _SESSION is None:
+            logger.error("❌ Cannot verify Phase 1 status: requests is not installed")
+            return False
+        
+        try:
+            response = _SESSION.get('http://localhost:8001/api/v1/optimization/status', timeout=5)
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('status') == 'active':
+                    logger.info("✅ Phase 1 optimizations confirmed active")
+                    return True
+            logger.error("❌ Phase 1 not fully active")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Cannot verify Phase 1 status: {e}")
+            return False
+    
+    def _write_artifact(self, relative_path: Path, content: bytes):
+        """Write pre-encoded artefact bytes below phase2_dir"""
+        path = self.phase2_dir / relative_path
+        if path.parent not in self._created_dirs:
+            os.makedirs(path.parent, exist_ok=True)
+            self._created_dirs.add(path.parent)
+        
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+    
+    def deploy_vector_optimization(self):
+        """Deploy advanced vector search optimizations"""
+        try:
+            logger.info("🎯 Deploying vector search optimization...")
+            
+            self._write_artifact(Path('vector-optimization', 'vector_optimizer.py'), VECTOR_OPTIMIZER_SRC)
+            
+            logger.info("✅ Vector search optimization deployed")
+            self.success_count += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to deploy vector optimization: {e}")
+            return False
+    
+    def deploy_concurrency_layer(self):
+        """Deploy async concurrency improvements"""
+        try:
+            logger.info("🎯 Deploying concurrency enhancements...")
+            
+            self._write_artifact(Path('concurrency', 'concurrency_manager.py'), CONCURRENCY_LAYER_SRC)
+            
+            logger.info("✅ Concurrency layer deployed")
+            self.success_count += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to deploy concurrency layer: {e}")
+            return False
+    
+    def deploy_ui_optimizations(self):
+        """Deploy frontend UI optimizations"""
+        try:
+            logger.info("🎯 Deploying UI performance optimizations...")
+            
+            self._write_artifact(Path('frontend', 'ui_optimizations.html'), UI_OPTIMIZATIONS_SRC)
+            
+            logger.info("✅ UI optimizations deployed")
+            self.success_count += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to deploy UI optimizations: {e}")
+            return False
+    
+    def deploy_enhanced_monitoring(self):
+        """Deploy enhanced monitoring for Phase 2"""
+        try:
+            logger.info("🎯 Deploying enhanced monitoring...")
             
-            monitor_file = self.phase2_dir / 'monitoring' / 'enhanced_monitor.py'
-            monitor_file.parent.mkdir(parents=True, exist_ok=True)
-            monitor_file.write_text(enhanced_monitoring)
+            self._write_artifact(Path('monitoring', 'enhanced_monitor.py'), ENHANCED_MONITORING_SRC)
             
             logger.info("✅ Enhanced monitoring deployed")
             self.success_count += 1
@@ -5,24 +5,49 @@ Advanced performance testing with concurrent users, stress testing, and performa
 
 import asyncio
 import aiohttp
+from yarl import URL
 import time
 import json
-import statistics
+import csv
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, field
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from collections import Counter
 import threading
+import queue
+import math
 import random
 import logging
-from contextlib import asynccontextmanager
 import argparse
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import psutil
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
+
+# orjson encodes request payloads straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# uvloop replaces the default event loop when installed
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    uvloop = None
+    UVLOOP_AVAILABLE = False
+
+# Numba compiles the chart window kernel when installed; NumPy is the fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
 
 @dataclass
 class LoadTestConfig:
@@ -35,9 +60,11 @@ class LoadTestConfig:
     request_timeout: float = 30.0
     think_time_min: float = 1.0  # seconds between requests
     think_time_max: float = 5.0
+    max_in_flight: Optional[int] = None  # Cap on concurrent requests; defaults to concurrent_users
     target_response_time: float = 0.080  # 80ms target
     target_success_rate: float = 0.99  # 99% success rate
     enable_monitoring: bool = True
+    exact_percentiles: bool = False  # Keep raw samples for exact percentiles, the CSV and per-request charts
     output_dir: str = "load_test_results"
 
 @dataclass
@@ -53,19 +80,255 @@ class TestResult:
     payload_size: int = 0
     response_size: int = 0
 
-class PerformanceMetrics:
-    """Collect and analyze performance metrics"""
+# More specific variations generated from each base test query
+QUERY_VARIATIONS = (
+    "Can you provide detailed information about {}?",
+    "What are the key concepts in {}?",
+    "Give me examples of {}",
+    "How can I learn more about {}?",
+)
+
+# Seconds between moves of queued results into the result columns
+RESULT_DRAIN_INTERVAL = 0.1
+
+# Seconds between progress log lines with streaming percentiles
+PROGRESS_LOG_INTERVAL = 10.0
+
+# Connections per simulated user's session
+USER_CONNECTION_LIMIT = 4
+
+# Points drawn on the response time scatter chart
+MAX_SCATTER_POINTS = 5000
+
+# Performance targets, in the order make_target_check evaluates them
+TARGET_NAMES = ('response_time_target_met', 'success_rate_target_met', 'throughput_sufficient')
+MIN_THROUGHPUT_RPS = 10.0
+
+# Response time percentiles reported by get_statistics
+PERCENTILES = (50, 90, 95, 99)
+
+# Results written to the CSV per batch of rows
+CSV_CHUNK_ROWS = 10_000
+
+# Header of the detailed results CSV
+CSV_FIELDS = ('timestamp', 'response_time', 'status_code', 'success', 'error_message',
+              'user_id', 'payload_size', 'response_size')
+
+# Log-spaced response time buckets (HdrHistogram style): 1% wide from 10us to 120s
+LATENCY_MIN_SECONDS = 0.00001
+LATENCY_MAX_SECONDS = 120.0
+LATENCY_GROWTH = 1.01
+
+# Bars on the response time distribution chart
+DISTRIBUTION_BINS = 50
+
+# Columns of the per-request result arrays, one per numeric TestResult field
+RESULT_COLUMNS = (
+    ('timestamp', np.float64),
+    ('response_time', np.float64),
+    ('status_code', np.int32),
+    ('success', np.bool_),
+    ('user_id', np.int32),
+    ('payload_size', np.int64),
+    ('response_size', np.int64),
+)
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def rolling_success_rate(success, window, step):
+        """Success fraction of each window-sized slice, advancing by step"""
+        num_windows = (len(success) - window) // step + 1
+        rates = np.empty(num_windows)
+        running = 0
+        for i in range(window):
+            running += success[i]
+        start = 0
+        for w in range(num_windows):
+            # Slide the running sum forward to this window's start
+            while start < w * step:
+                running += success[start + window]
+                running -= success[start]
+                start += 1
+            rates[w] = running / window
+        return rates
+else:
+    def rolling_success_rate(success: np.ndarray, window: int, step: int) -> np.ndarray:
+        """Success fraction of each window-sized slice, advancing by step"""
+        sums = np.concatenate(([0], np.cumsum(success, dtype=np.int64)))
+        starts = np.arange(0, len(success) - window + 1, step)
+        return (sums[starts + window] - sums[starts]) / window
+
+def make_target_check(max_p95: float, min_success_rate: float, min_throughput: float):
+    """Specialise the performance target comparisons on fixed thresholds
+    
+    The thresholds are bound once, so the returned check(p95, success_rate,
+    throughput) is three comparisons and can be called per sample window.
+    """
+    def check(p95: float, success_rate: float, throughput: float) -> Tuple[bool, bool, bool]:
+        return p95 <= max_p95, success_rate >= min_success_rate, throughput >= min_throughput
+    return check
+
+class ResponseTimeHistogram:
+    """Fixed-size log-bucket histogram of response times in seconds
+    
+    Memory is constant however long the test runs, histograms merge by adding
+    their counts, and quantiles are accurate to within one bucket (about 1%
+    relative error).
+    """
     
     def __init__(self):
-        self.results: List[TestResult] = []
+        self.log_growth = math.log(LATENCY_GROWTH)
+        num_buckets = math.ceil(math.log(LATENCY_MAX_SECONDS / LATENCY_MIN_SECONDS) / self.log_growth) + 1
+        # Representative value per bucket: geometric midpoint of its bounds
+        self.bucket_values = LATENCY_MIN_SECONDS * np.power(LATENCY_GROWTH, np.arange(num_buckets) + 0.5)
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+    
+    def record(self, value: float):
+        """Count one response time"""
+        if value <= LATENCY_MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(value / LATENCY_MIN_SECONDS) / self.log_growth), len(self.counts) - 1)
+        self.counts[bucket] += 1
+    
+    def merge(self, other: 'ResponseTimeHistogram'):
+        """Fold another histogram's counts into this one"""
+        self.counts += other.counts
+    
+    def percentiles(self, qs) -> List[float]:
+        """Approximate percentiles (0..100) of everything recorded so far"""
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1]
+        ranks = np.ceil(np.asarray(qs) / 100 * total).clip(1, total)
+        return self.bucket_values[np.searchsorted(cumulative, ranks, side='left')].tolist()
+    
+    def distribution(self, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(edges, counts) of at most bins bars over the occupied bucket range"""
+        occupied = np.flatnonzero(self.counts)
+        first, last = int(occupied[0]), int(occupied[-1]) + 1
+        # Bar boundaries fall on bucket boundaries, at least one bucket apart
+        bounds = np.linspace(first, last, min(bins, last - first) + 1).astype(np.int64)
+        counts = np.add.reduceat(self.counts[first:last], bounds[:-1] - first)
+        return LATENCY_MIN_SECONDS * np.power(LATENCY_GROWTH, bounds), counts
+
+class PerformanceMetrics:
+    """Collect and analyze performance metrics
+    
+    Every result updates running totals and a streaming response time
+    histogram, so memory stays constant however long the test runs and the
+    report percentiles are read from the histogram. With keep_samples, results
+    are also stored as a struct of arrays: one preallocated NumPy column per
+    TestResult field, filled slot by slot, with sparse error messages kept by
+    slot index. Those columns give exact percentiles and feed the CSV and the
+    per-request charts.
+    """
+    
+    def __init__(self, capacity: int = 1024,
+                 target_response_time: float = 0.080, target_success_rate: float = 0.99,
+                 keep_samples: bool = False):
+        self.keep_samples = keep_samples
+        self.columns = (
+            {name: np.empty(capacity, dtype=dtype) for name, dtype in RESULT_COLUMNS} if keep_samples else {}
+        )
+        self.error_messages: Dict[int, str] = {}
+        self.histogram = ResponseTimeHistogram()
+        self.check_targets = make_target_check(target_response_time, target_success_rate, MIN_THROUGHPUT_RPS)
         self.system_metrics: List[Dict] = []
         self.lock = threading.Lock()
+        # Producers only enqueue; drain() is the single writer of the totals and columns
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._size = 0
+        # Running totals; the mean and squared deviations are updated with Welford's method
+        self._successes = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self.error_types: Counter = Counter()
+        # Earliest and latest request timestamps, tracked as results are stored
+        self._first_ts = math.inf
+        self._last_ts = -math.inf
         self.start_time = time.time()
     
+    def __len__(self) -> int:
+        return self._size
+    
+    def column(self, name: str) -> np.ndarray:
+        """Recorded values of one result field; requires keep_samples"""
+        return self.columns[name][:self._size]
+    
+    def _grow(self, min_capacity: int):
+        """Reallocate every column to hold at least min_capacity results"""
+        capacity = len(self.columns['timestamp'])
+        new_capacity = max(capacity * 2, min_capacity)
+        for name, values in self.columns.items():
+            grown = np.empty(new_capacity, dtype=values.dtype)
+            grown[:capacity] = values
+            self.columns[name] = grown
+    
     def add_result(self, result: TestResult):
-        """Add test result thread-safely"""
-        with self.lock:
-            self.results.append(result)
+        """Queue a test result; SimpleQueue.put never blocks or takes a Python lock"""
+        self._pending.put_nowait(result)
+    
+    def drain(self) -> int:
+        """Fold queued results into the totals and columns, returning how many"""
+        drained = 0
+        while True:
+            try:
+                result = self._pending.get_nowait()
+            except queue.Empty:
+                return drained
+            self._store(result)
+            drained += 1
+    
+    def _store(self, result: TestResult):
+        """Count a test result, and write it into the next free slot when keeping samples"""
+        slot = self._size
+        response_time = result.response_time
+        self.histogram.record(response_time)
+        
+        delta = response_time - self._mean
+        self._mean += delta / (slot + 1)
+        self._m2 += delta * (response_time - self._mean)
+        if response_time < self._min:
+            self._min = response_time
+        if response_time > self._max:
+            self._max = response_time
+        if result.success:
+            self._successes += 1
+        else:
+            self.error_types[(result.status_code, result.error_message)] += 1
+        if result.timestamp < self._first_ts:
+            self._first_ts = result.timestamp
+        if result.timestamp > self._last_ts:
+            self._last_ts = result.timestamp
+        
+        if self.keep_samples:
+            if slot >= len(self.columns['timestamp']):
+                self._grow(slot + 1)
+            columns = self.columns
+            columns['timestamp'][slot] = result.timestamp
+            columns['response_time'][slot] = response_time
+            columns['status_code'][slot] = result.status_code
+            columns['success'][slot] = result.success
+            columns['user_id'][slot] = result.user_id
+            columns['payload_size'][slot] = result.payload_size
+            columns['response_size'][slot] = result.response_size
+            if result.error_message is not None:
+                self.error_messages[slot] = result.error_message
+        self._size = slot + 1
+    
+    def progress_percentiles(self) -> Optional[List[float]]:
+        """Approximate PERCENTILES of the results stored so far, for progress output"""
+        if not self._size:
+            return None
+        return self.histogram.percentiles(PERCENTILES)
     
     def add_system_metrics(self, metrics: Dict):
         """Add system metrics"""
@@ -74,40 +337,34 @@ class PerformanceMetrics:
     
     def get_statistics(self) -> Dict[str, Any]:
         """Calculate comprehensive performance statistics"""
-        if not self.results:
+        self.drain()
+        total_requests = len(self)
+        if not total_requests:
             return {}
         
-        response_times = [r.response_time for r in self.results]
-        successful_results = [r for r in self.results if r.success]
-        failed_results = [r for r in self.results if not r.success]
-        
-        total_requests = len(self.results)
-        successful_requests = len(successful_results)
-        failed_requests = len(failed_results)
+        successful_requests = self._successes
+        failed_requests = total_requests - successful_requests
         
-        success_rate = successful_requests / total_requests if total_requests > 0 else 0
+        success_rate = successful_requests / total_requests
         
-        # Response time statistics
-        avg_response_time = statistics.mean(response_times) if response_times else 0
-        median_response_time = statistics.median(response_times) if response_times else 0
-        min_response_time = min(response_times) if response_times else 0
-        max_response_time = max(response_times) if response_times else 0
+        # Response time statistics from the running totals
+        avg_response_time = self._mean
+        min_response_time = self._min
+        max_response_time = self._max
         
-        # Percentiles
-        p50 = np.percentile(response_times, 50) if response_times else 0
-        p90 = np.percentile(response_times, 90) if response_times else 0
-        p95 = np.percentile(response_times, 95) if response_times else 0
-        p99 = np.percentile(response_times, 99) if response_times else 0
+        # Percentiles: one pass for all four; the median is p50
+        if self.keep_samples:
+            p50, p90, p95, p99 = np.percentile(self.column('response_time'), PERCENTILES).tolist()
+        else:
+            p50, p90, p95, p99 = self.histogram.percentiles(PERCENTILES)
+        median_response_time = p50
         
         # Throughput calculation
-        test_duration = max([r.timestamp for r in self.results]) - min([r.timestamp for r in self.results])
+        test_duration = self._last_ts - self._first_ts
         throughput = total_requests / test_duration if test_duration > 0 else 0
         
         # Error analysis
-        error_types = {}
-        for result in failed_results:
-            error_key = f"{result.status_code}_{result.error_message}"
-            error_types[error_key] = error_types.get(error_key, 0) + 1
+        error_types = {f"{status_code}_{message}": count for (status_code, message), count in self.error_types.items()}
         
         return {
             'summary': {
@@ -127,14 +384,10 @@ class PerformanceMetrics:
                 'p90': p90,
                 'p95': p95,
                 'p99': p99,
-                'standard_deviation': statistics.stdev(response_times) if len(response_times) > 1 else 0
+                'standard_deviation': math.sqrt(self._m2 / (total_requests - 1)) if total_requests > 1 else 0
             },
             'errors': error_types,
-            'performance_targets': {
-                'response_time_target_met': p95 <= 80.0,  # 95th percentile under 80ms
-                'success_rate_target_met': success_rate >= 0.99,
-                'throughput_sufficient': throughput >= 10.0  # Minimum 10 RPS
-            }
+            'performance_targets': dict(zip(TARGET_NAMES, self.check_targets(p95, success_rate, throughput)))
         }
 
 class SystemMonitor:
@@ -145,32 +398,49 @@ class SystemMonitor:
         self.interval = interval
         self.monitoring = False
         self.monitor_thread = None
+        self._stop = threading.Event()
+        self._last_disk_io = None
+        self._last_network_io = None
     
     def start_monitoring(self):
         """Start system monitoring in background thread"""
+        # Prime the non-blocking CPU counter and the I/O baselines
+        psutil.cpu_percent(interval=None)
+        self._last_disk_io = psutil.disk_io_counters(nowrap=True)
+        self._last_network_io = psutil.net_io_counters(nowrap=True)
+        
         self.monitoring = True
+        self._stop.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.start()
     
     def stop_monitoring(self):
         """Stop system monitoring"""
         self.monitoring = False
+        # Wakes the loop out of its wait, so shutdown does not sit out the interval
+        self._stop.set()
         if self.monitor_thread:
             self.monitor_thread.join()
     
     def _monitor_loop(self):
         """Main monitoring loop"""
+        next_sample = time.monotonic() + self.interval
         while self.monitoring:
+            # Wait for the next tick so sampling keeps a fixed cadence
+            if self._stop.wait(max(0.0, next_sample - time.monotonic())):
+                break
+            next_sample += self.interval
+            
             try:
-                # CPU and Memory
-                cpu_percent = psutil.cpu_percent(interval=1)
+                # CPU usage since the previous call, without blocking
+                cpu_percent = psutil.cpu_percent(interval=None)
                 memory = psutil.virtual_memory()
                 
-                # Disk I/O
-                disk_io = psutil.disk_io_counters()
-                
-                # Network I/O
-                network_io = psutil.net_io_counters()
+                # Disk and network I/O, reported as deltas since the previous sample
+                disk_io = psutil.disk_io_counters(nowrap=True)
+                network_io = psutil.net_io_counters(nowrap=True)
+                last_disk_io, self._last_disk_io = self._last_disk_io, disk_io
+                last_network_io, self._last_network_io = self._last_network_io, network_io
                 
                 metrics_data = {
                     'timestamp': time.time(),
@@ -178,16 +448,18 @@ class SystemMonitor:
                     'memory_percent': memory.percent,
                     'memory_used_mb': memory.used / 1024 / 1024,
                     'memory_available_mb': memory.available / 1024 / 1024,
-                    'disk_read_mb': disk_io.read_bytes / 1024 / 1024 if disk_io else 0,
-                    'disk_write_mb': disk_io.write_bytes / 1024 / 1024 if disk_io else 0,
-                    'network_sent_mb': network_io.bytes_sent / 1024 / 1024 if network_io else 0,
-                    'network_recv_mb': network_io.bytes_recv / 1024 / 1024 if network_io else 0
+                    'disk_read_mb': (disk_io.read_bytes - last_disk_io.read_bytes) / 1024 / 1024
+                                    if disk_io and last_disk_io else 0,
+                    'disk_write_mb': (disk_io.write_bytes - last_disk_io.write_bytes) / 1024 / 1024
+                                     if disk_io and last_disk_io else 0,
+                    'network_sent_mb': (network_io.bytes_sent - last_network_io.bytes_sent) / 1024 / 1024
+                                       if network_io and last_network_io else 0,
+                    'network_recv_mb': (network_io.bytes_recv - last_network_io.bytes_recv) / 1024 / 1024
+                                       if network_io and last_network_io else 0
                 }
                 
                 self.metrics.add_system_metrics(metrics_data)
                 
-                time.sleep(self.interval)
-                
             except Exception as e:
                 logging.error(f"Error in system monitoring: {e}")
 
@@ -196,10 +468,17 @@ class RAGLoadTester:
     
     def __init__(self, config: LoadTestConfig):
         self.config = config
-        self.metrics = PerformanceMetrics()
+        self.metrics = PerformanceMetrics(
+            config.concurrent_users * config.requests_per_user,
+            target_response_time=config.target_response_time,
+            target_success_rate=config.target_success_rate,
+            keep_samples=config.exact_percentiles
+        )
         self.system_monitor = SystemMonitor(self.metrics)
-        self.session_pool = []
+        self._in_flight: Optional[asyncio.Semaphore] = None
         self.test_data = self._generate_test_data()
+        # Parsed once; aiohttp uses a yarl.URL as-is instead of re-parsing the string
+        self._search_url = URL(f"{config.base_url}/api/search")
         
         # Setup logging
         logging.basicConfig(
@@ -208,8 +487,8 @@ class RAGLoadTester:
         )
         self.logger = logging.getLogger(__name__)
     
-    def _generate_test_data(self) -> List[str]:
-        """Generate realistic test queries"""
+    def _generate_test_data(self) -> Tuple[Tuple[str, bytes], ...]:
+        """Generate realistic test queries paired with their encoded request bodies"""
         queries = [
             "What is machine learning?",
             "How does artificial intelligence work?",
@@ -235,25 +514,23 @@ class RAGLoadTester:
         ]
         
         # Generate variations and longer queries
-        extended_queries = queries.copy()
-        for query in queries:
-            # Add more specific variations
-            extended_queries.extend([
-                f"Can you provide detailed information about {query.lower()}?",
-                f"What are the key concepts in {query.lower()}?",
-                f"Give me examples of {query.lower()}",
-                f"How can I learn more about {query.lower()}?"
-            ])
-        
-        return extended_queries
-    
-    async def create_session_pool(self):
-        """Create pool of HTTP sessions for concurrent testing"""
-        connector_limit = min(self.config.concurrent_users * 2, 200)
+        lowered = [query.lower() for query in queries]
+        extended_queries = queries + [variation.format(query) for query in lowered for variation in QUERY_VARIATIONS]
+        
+        # Encode each search body once; only the query differs between them
+        return tuple(
+            (query, dumps_json({'query': query, 'max_results': 10, 'include_metadata': True}))
+            for query in extended_queries
+        )
+    
+    def create_user_session(self) -> aiohttp.ClientSession:
+        """Create the HTTP session owned by one simulated user
         
+        Each user gets a small connector of its own, so users never contend
+        on a shared connection pool.
+        """
         connector = aiohttp.TCPConnector(
-            limit=connector_limit,
-            limit_per_host=50,
+            limit=USER_CONNECTION_LIMIT,
             ttl_dns_cache=300,
             use_dns_cache=True,
             keepalive_timeout=30
@@ -264,36 +541,28 @@ class RAGLoadTester:
             connect=10.0
         )
         
-        session = aiohttp.ClientSession(
+        return aiohttp.ClientSession(
             connector=connector,
             timeout=timeout,
-            headers={'User-Agent': 'RAG-LoadTest/1.0'}
+            headers={'User-Agent': 'RAG-LoadTest/1.0', 'Content-Type': 'application/json'}
         )
-        
-        return session
     
     async def make_search_request(self, session: aiohttp.ClientSession, 
-                                query: str, user_id: int) -> TestResult:
+                                payload_bytes: bytes, user_id: int) -> TestResult:
         """Make a single search request and record metrics"""
-        start_time = time.time()
-        request_timestamp = start_time
+        # Wall clock only stamps the request; latency uses the monotonic clock
+        request_timestamp = time.time()
+        start_time = time.perf_counter()
         
         try:
-            payload = {
-                'query': query,
-                'max_results': 10,
-                'include_metadata': True
-            }
-            
-            payload_size = len(json.dumps(payload).encode('utf-8'))
+            payload_size = len(payload_bytes)
             
             async with session.post(
-                f"{self.config.base_url}/api/search",
-                json=payload
+                self._search_url,
+                data=payload_bytes
             ) as response:
-                response_data = await response.text()
-                response_size = len(response_data.encode('utf-8'))
-                response_time = time.time() - start_time
+                response_size = len(await response.read())
+                response_time = time.perf_counter() - start_time
                 
                 success = 200 <= response.status < 300
                 
@@ -312,7 +581,7 @@ class RAGLoadTester:
         except asyncio.TimeoutError:
             return TestResult(
                 timestamp=request_timestamp,
-                response_time=time.time() - start_time,
+                response_time=time.perf_counter() - start_time,
                 status_code=408,
                 success=False,
                 error_message="Request timeout",
@@ -322,7 +591,7 @@ class RAGLoadTester:
         except Exception as e:
             return TestResult(
                 timestamp=request_timestamp,
-                response_time=time.time() - start_time,
+                response_time=time.perf_counter() - start_time,
                 status_code=500,
                 success=False,
                 error_message=str(e),
@@ -330,31 +599,42 @@ class RAGLoadTester:
                 user_id=user_id
             )
     
-    async def simulate_user(self, session: aiohttp.ClientSession, user_id: int):
+    async def simulate_user(self, user_id: int, work: asyncio.Queue, start_offset: float = 0.0):
         """Simulate single user behavior with realistic patterns"""
+        if start_offset > 0:
+            await asyncio.sleep(start_offset)
         self.logger.info(f"Starting user {user_id}")
         
-        for request_num in range(self.config.requests_per_user):
-            # Select random query
-            query = random.choice(self.test_data)
+        async with self.create_user_session() as session:
+            completed = await self._run_user_requests(session, user_id, work)
+        
+        self.logger.info(f"User {user_id} completed {completed} requests")
+    
+    async def _run_user_requests(self, session: aiohttp.ClientSession, user_id: int,
+                                 work: asyncio.Queue) -> int:
+        """Take requests off the shared work queue until it is empty"""
+        rng = np.random.default_rng()
+        completed = 0
+        
+        while True:
+            try:
+                payload_bytes = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return completed
             
-            # Make request
-            result = await self.make_search_request(session, query, user_id)
+            # Make request; the semaphore caps requests in flight across all users
+            async with self._in_flight:
+                result = await self.make_search_request(session, payload_bytes, user_id)
             self.metrics.add_result(result)
+            completed += 1
             
             # Log progress periodically
-            if request_num % 5 == 0:
-                self.logger.info(f"User {user_id}: completed {request_num + 1}/{self.config.requests_per_user} requests")
+            if completed % 5 == 1:
+                self.logger.info(f"User {user_id}: completed {completed} requests")
             
-            # Think time between requests (except for last request)
-            if request_num < self.config.requests_per_user - 1:
-                think_time = random.uniform(
-                    self.config.think_time_min,
-                    self.config.think_time_max
-                )
-                await asyncio.sleep(think_time)
-        
-        self.logger.info(f"User {user_id} completed all requests")
+            # Think time between requests (except after the last one)
+            if not work.empty():
+                await asyncio.sleep(rng.uniform(self.config.think_time_min, self.config.think_time_max))
     
     async def run_load_test(self):
         """Execute the complete load test scenario"""
@@ -366,41 +646,61 @@ class RAGLoadTester:
         if self.config.enable_monitoring:
             self.system_monitor.start_monitoring()
         
-        # Create session pool
-        session = await self.create_session_pool()
+        drain_task = asyncio.create_task(self._drain_results())
+        
+        # Every request of the run is queued up front; users pull from it
+        work = asyncio.Queue()
+        total_requests = self.config.concurrent_users * self.config.requests_per_user
+        for _, payload_bytes in random.choices(self.test_data, k=total_requests):
+            work.put_nowait(payload_bytes)
+        self._in_flight = asyncio.Semaphore(self.config.max_in_flight or self.config.concurrent_users)
         
         try:
             # Create user simulation tasks with ramp-up
             tasks = []
             ramp_up_delay = self.config.ramp_up_time / self.config.concurrent_users
             
+            # All tasks are created up front; each sleeps until its scheduled
+            # start, which staggers user starts for realistic ramp-up
             for user_id in range(self.config.concurrent_users):
-                # Stagger user starts for realistic ramp-up
-                if user_id > 0:
-                    await asyncio.sleep(ramp_up_delay)
-                
                 task = asyncio.create_task(
-                    self.simulate_user(session, user_id)
+                    self.simulate_user(user_id, work, user_id * ramp_up_delay)
                 )
                 tasks.append(task)
             
             # Wait for all users to complete or timeout
-            try:
-                await asyncio.wait_for(
-                    asyncio.gather(*tasks, return_exceptions=True),
-                    timeout=self.config.test_duration
-                )
-            except asyncio.TimeoutError:
+            done, pending = await asyncio.wait(tasks, timeout=self.config.test_duration)
+            if pending:
                 self.logger.warning(f"Test timed out after {self.config.test_duration}s")
-                # Cancel remaining tasks
-                for task in tasks:
+                # Cancel remaining tasks and let them close their sessions
+                for task in pending:
                     task.cancel()
+                await asyncio.wait(pending)
+            
+            for task in done:
+                if task.exception() is not None:
+                    self.logger.error(f"User simulation failed: {task.exception()}")
         
         finally:
-            await session.close()
+            drain_task.cancel()
+            self.metrics.drain()
             if self.config.enable_monitoring:
                 self.system_monitor.stop_monitoring()
     
+    async def _drain_results(self):
+        """Periodically fold queued results into the metrics off the request path"""
+        next_progress = time.monotonic() + PROGRESS_LOG_INTERVAL
+        while True:
+            self.metrics.drain()
+            if time.monotonic() >= next_progress:
+                next_progress += PROGRESS_LOG_INTERVAL
+                percentiles = self.metrics.progress_percentiles()
+                if percentiles is not None:
+                    p50, _, p95, _ = percentiles
+                    self.logger.info(f"Progress: {len(self.metrics)} results, "
+                                     f"p50 ~{p50 * 1000:.1f}ms, p95 ~{p95 * 1000:.1f}ms")
+            await asyncio.sleep(RESULT_DRAIN_INTERVAL)
+    
     def generate_report(self) -> Dict[str, Any]:
         """Generate comprehensive test report"""
         stats = self.metrics.get_statistics()
@@ -443,57 +743,66 @@ class RAGLoadTester:
         with open(report_file, 'w') as f:
             json.dump(report, f, indent=2, default=str)
         
-        # Save detailed results CSV
-        if self.metrics.results:
-            df = pd.DataFrame([
-                {
-                    'timestamp': r.timestamp,
-                    'response_time': r.response_time,
-                    'status_code': r.status_code,
-                    'success': r.success,
-                    'error_message': r.error_message,
-                    'user_id': r.user_id,
-                    'payload_size': r.payload_size,
-                    'response_size': r.response_size
-                }
-                for r in self.metrics.results
-            ])
-            
+        # Save detailed results CSV; only raw samples have per-request rows
+        if self.metrics.keep_samples and len(self.metrics):
             csv_file = os.path.join(
                 self.config.output_dir,
                 f'load_test_results_{timestamp}.csv'
             )
-            df.to_csv(csv_file, index=False)
+            
+            # Rows are zipped from CSV_CHUNK_ROWS-long slices of the result
+            # columns, so only one chunk is ever boxed as Python objects
+            error_messages = self.metrics.error_messages
+            error_index = CSV_FIELDS.index('error_message')
+            with open(csv_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+                for start in range(0, len(self.metrics), CSV_CHUNK_ROWS):
+                    stop = min(start + CSV_CHUNK_ROWS, len(self.metrics))
+                    columns = [self.metrics.column(name)[start:stop].tolist() for name, _ in RESULT_COLUMNS]
+                    columns.insert(error_index, [error_messages.get(slot, '') for slot in range(start, stop)])
+                    writer.writerows(zip(*columns))
         
         self.logger.info(f"Results saved to {self.config.output_dir}")
         return report_file
     
     def create_performance_charts(self, report: Dict[str, Any]):
         """Generate performance visualization charts"""
-        if not self.metrics.results:
+        if not len(self.metrics):
             return
         
         os.makedirs(self.config.output_dir, exist_ok=True)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        # Response time over time chart
         plt.figure(figsize=(12, 8))
         
-        timestamps = [r.timestamp - self.metrics.start_time for r in self.metrics.results]
-        response_times = [r.response_time * 1000 for r in self.metrics.results]  # Convert to ms
-        
-        plt.subplot(2, 2, 1)
-        plt.scatter(timestamps, response_times, alpha=0.6, s=2)
-        plt.axhline(y=self.config.target_response_time * 1000, color='r', linestyle='--', label='Target')
-        plt.xlabel('Time (seconds)')
-        plt.ylabel('Response Time (ms)')
-        plt.title('Response Time Over Time')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
+        # Response time over time; the per-request panels need raw samples
+        if self.metrics.keep_samples:
+            timestamps = self.metrics.column('timestamp') - self.metrics.start_time
+            response_times = self.metrics.column('response_time') * 1000  # Convert to ms
+            
+            # Plot a uniform sample of large runs; the axes and shape are unchanged
+            if len(timestamps) > MAX_SCATTER_POINTS:
+                sample = np.random.default_rng().choice(len(timestamps), MAX_SCATTER_POINTS, replace=False)
+                scatter_timestamps, scatter_response_times = timestamps[sample], response_times[sample]
+            else:
+                scatter_timestamps, scatter_response_times = timestamps, response_times
+            
+            plt.subplot(2, 2, 1)
+            plt.scatter(scatter_timestamps, scatter_response_times, alpha=0.6, s=2, rasterized=True)
+            plt.axhline(y=self.config.target_response_time * 1000, color='r', linestyle='--', label='Target')
+            plt.xlabel('Time (seconds)')
+            plt.ylabel('Response Time (ms)')
+            plt.title('Response Time Over Time')
+            plt.legend()
+            plt.grid(True, alpha=0.3)
         
-        # Response time distribution
+        # Response time distribution, read from the histogram on log-spaced bars
         plt.subplot(2, 2, 2)
-        plt.hist(response_times, bins=50, alpha=0.7, edgecolor='black')
+        edges, counts = self.metrics.histogram.distribution(DISTRIBUTION_BINS)
+        edges = edges * 1000  # Convert to ms
+        plt.bar(edges[:-1], counts, width=np.diff(edges), align='edge', alpha=0.7, edgecolor='black')
+        plt.xscale('log')
         plt.axvline(x=self.config.target_response_time * 1000, color='r', linestyle='--', label='Target')
         plt.xlabel('Response Time (ms)')
         plt.ylabel('Frequency')
@@ -502,16 +811,14 @@ class RAGLoadTester:
         plt.grid(True, alpha=0.3)
         
         # Success rate over time
-        if len(timestamps) > 10:
+        if self.metrics.keep_samples and len(timestamps) > 10:
             window_size = max(10, len(timestamps) // 20)
-            success_rates = []
-            time_windows = []
+            step = window_size // 2
             
-            for i in range(0, len(self.metrics.results) - window_size + 1, window_size // 2):
-                window_results = self.metrics.results[i:i + window_size]
-                success_rate = sum(1 for r in window_results if r.success) / len(window_results)
-                success_rates.append(success_rate * 100)
-                time_windows.append(timestamps[i + window_size // 2])
+            # uint8 view so the kernel sums plain integers
+            success = self.metrics.column('success').view(np.uint8)
+            success_rates = rolling_success_rate(success, window_size, step) * 100
+            time_windows = timestamps[np.arange(len(success_rates)) * step + step]
             
             plt.subplot(2, 2, 3)
             plt.plot(time_windows, success_rates, marker='o')
@@ -551,8 +858,11 @@ async def main():
     parser.add_argument('--url', default='https://rag.sirth.ch', help='Base URL for testing')
     parser.add_argument('--users', type=int, default=50, help='Number of concurrent users')
     parser.add_argument('--requests', type=int, default=20, help='Requests per user')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='Maximum requests in flight (default: users)')
     parser.add_argument('--duration', type=int, default=300, help='Test duration in seconds')
     parser.add_argument('--target-time', type=float, default=0.080, help='Target response time in seconds')
+    parser.add_argument('--exact-percentiles', action='store_true',
+                        help='Keep raw samples for exact percentiles, the results CSV and per-request charts')
     parser.add_argument('--output-dir', default='load_test_results', help='Output directory')
     
     args = parser.parse_args()
@@ -561,8 +871,10 @@ async def main():
         base_url=args.url,
         concurrent_users=args.users,
         requests_per_user=args.requests,
+        max_in_flight=args.max_in_flight,
         test_duration=args.duration,
         target_response_time=args.target_time,
+        exact_percentiles=args.exact_percentiles,
         output_dir=args.output_dir
     )
     
@@ -572,7 +884,7 @@ async def main():
     print(f"📊 Configuration: {config.concurrent_users} users, {config.requests_per_user} requests each")
     print(f"🎯 Target: {config.target_response_time * 1000}ms response time, {config.target_success_rate * 100}% success rate")
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         await tester.run_load_test()
@@ -587,7 +899,7 @@ async def main():
         response_times = report.get('response_times', {})
         assessment = report.get('assessment', {})
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         
         print(f"\n📋 LOAD TEST RESULTS")
         print(f"=" * 50)
@@ -608,4 +920,13 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if UVLOOP_AVAILABLE and sys.version_info >= (3, 11):
+        # libuv event loop: cheaper scheduling and socket I/O for many concurrent users
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(main())
+    elif UVLOOP_AVAILABLE:
+        # asyncio.Runner is new in 3.11; older interpreters select uvloop by policy
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
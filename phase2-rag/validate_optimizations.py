@@ -4,14 +4,49 @@ Comprehensive validation script for Phase 1 & 2 optimizations
 Tests all performance improvements and validates system health
 """
 
+import sys
 import time
+import asyncio
 import json
+import aiohttp
 import requests
-import statistics
-from typing import Dict, List, Any
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional
 from datetime import datetime
-import concurrent.futures
 import random
+import numpy as np
+
+# orjson encodes request bodies and the report straight to bytes; json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# Queries sampled by the response time test
+TEST_QUERIES = (
+    "What is machine learning?",
+    "How does AI work?",
+    "Explain neural networks",
+    "What is deep learning?",
+    "How do transformers work?"
+)
+
+# Sent with request bodies that were encoded ahead of time
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def dumps_json(data: Any) -> bytes:
+    """Encode to compact UTF-8 JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+def dumps_report(data: Any) -> bytes:
+    """Encode the report as indented UTF-8 JSON bytes, using orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2, default=str).encode('utf-8')
 
 class OptimizationValidator:
     def __init__(self):
@@ -21,12 +56,35 @@ class OptimizationValidator:
         self.test_passed = 0
         self.test_failed = 0
         
+        # One pooled keep-alive session for every test, so timings exclude
+        # TCP connection setup after the first request to each host. The
+        # blocking tests run one request at a time against the API and the
+        # optimization service, so one kept connection per host is enough
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=1, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Connection'] = 'keep-alive'
+        
+        # Request bodies are encoded once, not on every request
+        self._test_payloads = [dumps_json({"query": query}) for query in TEST_QUERIES]
+    
+    def __enter__(self) -> 'OptimizationValidator':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
+        
     def test_system_health(self) -> bool:
         """Test basic system health"""
         print("\n🔍 Testing System Health...")
         try:
             # Test main RAG system
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = self.session.get(f"{self.base_url}/health", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('status') == 'healthy':
@@ -45,7 +103,7 @@ class OptimizationValidator:
         """Test Phase 1 optimization status"""
         print("\n🔍 Testing Phase 1 Optimizations...")
         try:
-            response = requests.get(f"{self.optimization_url}/api/v1/optimization/status", timeout=5)
+            response = self.session.get(f"{self.optimization_url}/api/v1/optimization/status", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('status') == 'active':
@@ -68,36 +126,28 @@ class OptimizationValidator:
         print(f"\n⚡ Testing Response Times ({num_requests} requests)...")
         response_times = []
         
-        test_queries = [
-            "What is machine learning?",
-            "How does AI work?",
-            "Explain neural networks",
-            "What is deep learning?",
-            "How do transformers work?"
-        ]
-        
         for i in range(num_requests):
-            query = random.choice(test_queries)
-            start_time = time.time()
+            payload = random.choice(self._test_payloads)
+            start_time = time.perf_counter_ns()
             
             try:
-                response = requests.post(
+                response = self.session.post(
                     f"{self.base_url}/api/v1/query",
-                    json={"query": query},
+                    data=payload,
+                    headers=JSON_HEADERS,
                     timeout=10
                 )
                 
                 if response.status_code == 200:
-                    elapsed = (time.time() - start_time) * 1000  # Convert to ms
+                    elapsed = (time.perf_counter_ns() - start_time) / 1_000_000  # Convert to ms
                     response_times.append(elapsed)
                     print(f"  Query {i+1}: {elapsed:.2f}ms")
             except Exception as e:
                 print(f"  Query {i+1}: Failed - {e}")
         
         if response_times:
-            avg_time = statistics.mean(response_times)
-            median_time = statistics.median(response_times)
-            p95_time = statistics.quantiles(response_times, n=20)[18] if len(response_times) > 5 else max(response_times)
+            rt = np.fromiter(response_times, dtype=np.float64)
+            avg_time, median_time, p95_time = rt.mean(), np.median(rt), np.percentile(rt, 95)
             
             print(f"\n  📊 Response Time Results:")
             print(f"    Average: {avg_time:.2f}ms")
@@ -126,33 +176,19 @@ class OptimizationValidator:
         """Test concurrent user capacity"""
         print(f"\n👥 Testing Concurrent Users ({num_users} simultaneous)...")
         
-        def make_request(user_id: int) -> float:
-            start = time.time()
-            try:
-                response = requests.post(
-                    f"{self.base_url}/api/v1/query",
-                    json={"query": f"Test query from user {user_id}"},
-                    timeout=30
-                )
-                if response.status_code == 200:
-                    return time.time() - start
-            except:
-                pass
-            return -1
+        # Every user is a coroutine on one event loop rather than a thread
+        results = asyncio.run(self._run_concurrent_requests(num_users))
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_users) as executor:
-            futures = [executor.submit(make_request, i) for i in range(num_users)]
-            results = [f.result() for f in concurrent.futures.as_completed(futures)]
-        
-        successful = [r for r in results if r > 0]
+        rt = np.fromiter(results, dtype=np.float64)
+        successful = rt[rt > 0]
         failed = len(results) - len(successful)
         
         print(f"  📊 Concurrent Test Results:")
         print(f"    Successful: {len(successful)}/{num_users}")
         print(f"    Failed: {failed}")
         
-        if successful:
-            avg_time = statistics.mean(successful) * 1000
+        if successful.size:
+            avg_time = successful.mean() * 1000
             print(f"    Average response: {avg_time:.2f}ms")
         
         if len(successful) >= num_users * 0.95:  # 95% success rate
@@ -169,6 +205,51 @@ class OptimizationValidator:
             "success_rate": (len(successful) / num_users) * 100
         }
     
+    async def _run_concurrent_requests(self, num_users: int) -> List[float]:
+        """Send one query per user at once; seconds per request, -1 on failure"""
+        async def make_request(session: aiohttp.ClientSession, payload: bytes) -> float:
+            start = time.perf_counter_ns()
+            try:
+                async with session.post(
+                    f"{self.base_url}/api/v1/query",
+                    data=payload,
+                    headers=JSON_HEADERS
+                ) as response:
+                    await response.read()
+                    if response.status == 200:
+                        return (time.perf_counter_ns() - start) / 1_000_000_000
+            except Exception:
+                pass
+            return -1
+        
+        payloads = [dumps_json({"query": f"Test query from user {user_id}"}) for user_id in range(num_users)]
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=num_users, keepalive_timeout=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+            return await asyncio.gather(*(make_request(session, payload) for payload in payloads))
+    
+    async def _run_cache_queries(self, query: str, repeats: int) -> List[Any]:
+        """Prime the cache with one query, then send the remaining repeats at once
+        
+        Each outcome is the latency in ms, None for a non-200 reply, or the
+        exception raised by that request.
+        """
+        payload = dumps_json({"query": query})
+        
+        async def timed_query(session: aiohttp.ClientSession) -> Optional[float]:
+            start = time.perf_counter_ns()
+            async with session.post(f"{self.base_url}/api/v1/query", data=payload, headers=JSON_HEADERS) as response:
+                await response.read()
+                if response.status == 200:
+                    return (time.perf_counter_ns() - start) / 1_000_000
+            return None
+        
+        connector = aiohttp.TCPConnector(limit_per_host=repeats, keepalive_timeout=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+            first = await asyncio.gather(timed_query(session), return_exceptions=True)
+            rest = await asyncio.gather(*(timed_query(session) for _ in range(repeats - 1)),
+                                        return_exceptions=True)
+        return first + rest
+    
     def test_cache_efficiency(self) -> Dict[str, Any]:
         """Test cache efficiency by repeating queries"""
         print("\n💾 Testing Cache Efficiency...")
@@ -176,27 +257,20 @@ class OptimizationValidator:
         test_query = "What is artificial intelligence?"
         response_times = []
         
-        # Make the same query 5 times
-        for i in range(5):
-            start = time.time()
-            try:
-                response = requests.post(
-                    f"{self.base_url}/api/v1/query",
-                    json={"query": test_query},
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    elapsed = (time.time() - start) * 1000
-                    response_times.append(elapsed)
-                    print(f"  Query {i+1}: {elapsed:.2f}ms")
-            except Exception as e:
-                print(f"  Query {i+1}: Failed - {e}")
+        # Make the same query 5 times: one cache miss, then four overlapping hits
+        outcomes = asyncio.run(self._run_cache_queries(test_query, 5))
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                print(f"  Query {i+1}: Failed - {outcome}")
+            elif outcome is not None:
+                response_times.append(outcome)
+                print(f"  Query {i+1}: {outcome:.2f}ms")
         
         if len(response_times) >= 2:
             # First query should be slower (cache miss)
             # Subsequent queries should be faster (cache hits)
             first_time = response_times[0]
-            avg_cached = statistics.mean(response_times[1:])
+            avg_cached = np.mean(response_times[1:])
             speedup = first_time / avg_cached if avg_cached > 0 else 1
             
             print(f"\n  📊 Cache Performance:")
@@ -266,19 +340,23 @@ class OptimizationValidator:
             else:
                 print(f"⚠️  Performance improvement below 50% target")
         
+        report = dumps_report({
+            'timestamp': datetime.now().isoformat(),
+            'tests_passed': self.test_passed,
+            'tests_failed': self.test_failed,
+            'success_rate': (self.test_passed / (self.test_passed + self.test_failed) * 100),
+            'results': self.results
+        })
+        
         print("\n📋 Detailed Results:")
-        print(json.dumps(self.results, indent=2, default=str))
+        sys.stdout.flush()
+        sys.stdout.buffer.write(dumps_report(self.results))
+        sys.stdout.write('\n')
         
         # Save report to file
         report_file = f"/home/shu/Developer/ProjektSusui/ProjectSusi-main/website/phase2-rag/validation_report_{int(time.time())}.json"
-        with open(report_file, 'w') as f:
-            json.dump({
-                'timestamp': datetime.now().isoformat(),
-                'tests_passed': self.test_passed,
-                'tests_failed': self.test_failed,
-                'success_rate': (self.test_passed / (self.test_passed + self.test_failed) * 100),
-                'results': self.results
-            }, f, indent=2, default=str)
+        with open(report_file, 'wb') as f:
+            f.write(report)
         
         print(f"\n📄 Report saved to: {report_file}")
     
@@ -302,6 +380,6 @@ class OptimizationValidator:
         return self.test_passed > self.test_failed
 
 if __name__ == "__main__":
-    validator = OptimizationValidator()
-    success = validator.run_validation()
+    with OptimizationValidator() as validator:
+        success = validator.run_validation()
     exit(0 if success else 1)
\ No newline at end of file
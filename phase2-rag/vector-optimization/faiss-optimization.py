@@ -8,9 +8,46 @@ import faiss
 import time
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
+from collections import OrderedDict
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import io
+import os
+
+# Redis backs the shared tier of SearchCache when installed
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+# Query matrices larger than this are searched in blocks that stay cache resident
+L3_CACHE_BYTES = 32 * 1024 * 1024
+
+# Datasets at least this large use IVFPQFastScan instead of a flat index
+FASTSCAN_MIN_VECTORS = 2000
+FASTSCAN_NPROBE = 16
+
+# faiss wants ~39 training points per IVF list; nlist is capped to honour it
+IVF_MIN_POINTS_PER_LIST = 39
+
+# Quantizers are trained on at most this many randomly sampled vectors
+TRAIN_SAMPLE_SIZE = 65536
+
+# Search times retained by PerformanceMonitor (4 MB of float32)
+SEARCH_TIMES_CAPACITY = 1_000_000
+
+# Fills ragged ground truth rows; never a valid id, and distinct from faiss's -1
+RECALL_PAD_ID = np.iinfo(np.int64).min
+
+def _fastscan_subquantizers(dimension: int) -> int:
+    """Largest PQ sub-quantizer count up to min(dim // 2, 64) that divides dim"""
+    m = max(1, min(dimension // 2, 64))
+    while dimension % m:
+        m -= 1
+    return m
 
 @dataclass
 class OptimizationConfig:
@@ -30,26 +67,53 @@ class FAISSOptimizer:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.performance_metrics = {}
+        # GPU searches run on one thread per device; more threads only contend for it
+        self._gpu_executor: Optional[ThreadPoolExecutor] = None
+        # Let faiss's OpenMP pool use every core for a single search call
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
         
     def create_optimized_index(self, vectors: np.ndarray, dimension: int) -> faiss.Index:
-        """Create optimized FAISS index with hybrid approach"""
+        """Create optimized FAISS index with hybrid approach
+        
+        The vectors are L2-normalized before training and adding, so inner
+        product equals cosine similarity and the search kernel is a plain dot
+        product. Callers must likewise run faiss.normalize_L2(queries) on
+        contiguous float32 queries before index.search.
+        """
+        # Normalized copy; the caller's array is left untouched
+        vectors = np.array(vectors, dtype=np.float32, order='C')
+        faiss.normalize_L2(vectors)
         n_vectors = len(vectors)
         
-        if n_vectors < 10000:
+        if n_vectors < FASTSCAN_MIN_VECTORS:
             # Use flat index for small datasets
             index = faiss.IndexFlatIP(dimension)
         elif n_vectors < 100000:
-            # Use IVF with product quantization
+            # IVF with 4-bit PQ codes scanned by the SIMD fast-scan kernels
+            nlist = max(1, min(self.config.nlist, n_vectors // IVF_MIN_POINTS_PER_LIST))
             quantizer = faiss.IndexFlatIP(dimension)
-            index = faiss.IndexIVFPQ(quantizer, dimension, 
-                                    self.config.nlist, self.config.m, self.config.nbits)
+            index = faiss.IndexIVFPQFastScan(quantizer, dimension, nlist,
+                                            _fastscan_subquantizers(dimension), 4,
+                                            faiss.METRIC_INNER_PRODUCT)
+            index.nprobe = min(FASTSCAN_NPROBE, nlist)
         else:
             # Use hierarchical clustering for large datasets
             index = self._create_hierarchical_index(dimension)
+        
+        if not index.is_trained:
+            # A random subsample trains the quantizers as well as the full set
+            if n_vectors > TRAIN_SAMPLE_SIZE:
+                sample = np.random.default_rng().choice(n_vectors, TRAIN_SAMPLE_SIZE, replace=False)
+                index.train(vectors[sample])
+            else:
+                index.train(vectors)
+        index.add(vectors)
             
         # GPU acceleration if available
         if self.config.use_gpu and faiss.get_num_gpus() > 0:
             index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+            if self._gpu_executor is None:
+                self._gpu_executor = ThreadPoolExecutor(max_workers=faiss.get_num_gpus())
             
         return index
     
@@ -62,10 +126,11 @@ class FAISSOptimizer:
         index = faiss.IndexIVFPQ(coarse_quantizer, dimension,
                                 self.config.nlist, self.config.m, self.config.nbits)
         
-        # Add LSH preprocessing for dimension reduction
+        # Learned OPQ rotation ahead of PQ for high-dimensional data; it is
+        # trained together with the index by IndexPreTransform.train
         if dimension > 512:
-            lsh_index = faiss.IndexLSH(dimension, dimension // 2)
-            index = faiss.IndexPreTransform(lsh_index, index)
+            opq = faiss.OPQMatrix(dimension, self.config.m)
+            index = faiss.IndexPreTransform(opq, index)
             
         return index
     
@@ -81,9 +146,9 @@ class FAISSOptimizer:
             if hasattr(index, 'nprobe'):
                 index.nprobe = nprobe
                 
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
             _, indices = index.search(queries, 10)
-            search_time = time.time() - start_time
+            search_time = (time.perf_counter_ns() - start_ns) / 1_000_000_000
             
             # Calculate recall
             recall = self._calculate_recall(indices, ground_truth)
@@ -97,29 +162,31 @@ class FAISSOptimizer:
     
     async def batch_search_async(self, index: faiss.Index, 
                                queries: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
-        """Asynchronous batch search with optimized throughput"""
-        batch_size = self.config.batch_size
-        num_batches = (len(queries) + batch_size - 1) // batch_size
-        
-        async def search_batch(batch_queries):
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: index.search(batch_queries, k))
-        
-        # Process batches concurrently
-        tasks = []
-        for i in range(num_batches):
-            start_idx = i * batch_size
-            end_idx = min((i + 1) * batch_size, len(queries))
-            batch = queries[start_idx:end_idx]
-            tasks.append(search_batch(batch))
-        
-        results = await asyncio.gather(*tasks)
+        """Asynchronous batch search with optimized throughput
         
-        # Combine results
-        all_distances = np.vstack([r[0] for r in results])
-        all_indices = np.vstack([r[1] for r in results])
+        faiss parallelises a search across its queries with OpenMP, so the
+        whole matrix goes to index.search in one call rather than as
+        Python-side sub-batches that fragment the parallel region.
+        """
+        # One contiguous float32 copy up front, usable by faiss without converting
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        loop = asyncio.get_running_loop()
+        # None (the default pool) unless indexes were placed on a GPU
+        return await loop.run_in_executor(self._gpu_executor, self._search_blocked, index, queries, k)
+    
+    @staticmethod
+    def _search_blocked(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search in one call, or in L3-sized row blocks when the queries exceed L3"""
+        if queries.nbytes <= L3_CACHE_BYTES:
+            return index.search(queries, k)
         
-        return all_distances, all_indices
+        block_rows = max(1, L3_CACHE_BYTES // (queries.shape[1] * queries.itemsize))
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for start in range(0, len(queries), block_rows):
+            end = start + block_rows
+            distances[start:end], indices[start:end] = index.search(queries[start:end], k)
+        return distances, indices
     
     def enable_memory_mapping(self, index: faiss.Index, index_file: str):
         """Enable memory mapping for large indices to reduce RAM usage"""
@@ -130,84 +197,168 @@ class FAISSOptimizer:
         mmap_index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP)
         return mmap_index
     
-    def implement_caching_layer(self) -> 'SearchCache':
+    def implement_caching_layer(self, redis_url: Optional[str] = None) -> 'SearchCache':
         """Implement intelligent caching for frequent queries"""
-        return SearchCache(max_size=10000, ttl_seconds=3600)
+        return SearchCache(max_size=10000, ttl_seconds=3600, redis_url=redis_url)
     
     def _calculate_recall(self, retrieved: np.ndarray, ground_truth: List[List[int]]) -> float:
         """Calculate recall@k for search quality assessment"""
-        total_recall = 0
-        for i, gt in enumerate(ground_truth):
-            if i < len(retrieved):
-                retrieved_set = set(retrieved[i])
-                gt_set = set(gt)
-                recall = len(retrieved_set.intersection(gt_set)) / len(gt_set)
-                total_recall += recall
-        return total_recall / len(ground_truth)
+        n = min(len(ground_truth), len(retrieved))
+        
+        # Pad the (deduplicated) ground truth rows into one id matrix
+        gt_rows = [list(dict.fromkeys(gt)) for gt in ground_truth[:n]]
+        gt_lengths = np.array([len(gt) for gt in gt_rows], dtype=np.float64)
+        gt_ids = np.full((n, int(gt_lengths.max(initial=0))), RECALL_PAD_ID, dtype=np.int64)
+        for i, gt in enumerate(gt_rows):
+            gt_ids[i, :len(gt)] = gt
+        
+        # A ground truth id is found if any retrieved id in its row equals it
+        found = (np.asarray(retrieved[:n], dtype=np.int64)[:, :, None] == gt_ids[:, None, :]).any(axis=1)
+        total_recall = (found.sum(axis=1) / np.maximum(gt_lengths, 1)).sum()
+        return float(total_recall) / len(ground_truth)
+
+def _encode_results(results: Tuple[np.ndarray, np.ndarray]) -> bytes:
+    """Serialise (distances, indices) as an .npz archive for the shared cache"""
+    distances, indices = results
+    buf = io.BytesIO()
+    np.savez(buf, distances=np.asarray(distances), indices=np.asarray(indices))
+    return buf.getvalue()
+
+def _decode_results(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Read (distances, indices) written by _encode_results
+    
+    Object arrays are refused, so a forged entry cannot run code on load.
+    """
+    with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+        return archive['distances'], archive['indices']
 
 class SearchCache:
-    """Intelligent caching system for vector search results"""
+    """Intelligent caching system for vector search results
+    
+    An in-process LRU fronts an optional Redis store shared by every worker.
+    Redis applies the TTL with EXPIRE and, configured with
+    maxmemory-policy allkeys-lru, does its own eviction.
+    """
     
-    def __init__(self, max_size: int = 10000, ttl_seconds: int = 3600):
-        self.cache = {}
-        self.access_times = {}
+    REDIS_TIMEOUT = 0.5  # seconds; a slow Redis falls back to a cache miss
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 3600,
+                 redis_url: Optional[str] = None, key_prefix: str = "faiss:search:"):
+        # Least recently used first; each value is (last access monotonic_ns, results)
+        self.cache: OrderedDict = OrderedDict()
         self.max_size = max_size
         self.ttl = ttl_seconds
+        # Local entries age on the monotonic clock, immune to wall-clock jumps
+        self._ttl_ns = ttl_seconds * 1_000_000_000
+        self.key_prefix = key_prefix
+        self.redis_client = None
+        if redis_url:
+            self.connect_redis(redis_url)
+    
+    def connect_redis(self, redis_url: str):
+        """Connect the shared Redis tier"""
+        if not REDIS_AVAILABLE:
+            logging.warning("redis is not installed; search cache stays in-process")
+            return
+        try:
+            self.redis_client = redis.Redis.from_url(
+                redis_url,
+                decode_responses=False,
+                socket_timeout=self.REDIS_TIMEOUT,
+                socket_connect_timeout=self.REDIS_TIMEOUT
+            )
+            self.redis_client.ping()
+        except Exception as e:
+            logging.warning(f"Could not connect to Redis search cache: {e}")
+            self.redis_client = None
     
     def get(self, query_hash: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
         """Retrieve cached search results"""
-        if query_hash in self.cache:
-            current_time = time.time()
-            if current_time - self.access_times[query_hash] < self.ttl:
-                self.access_times[query_hash] = current_time
-                return self.cache[query_hash]
+        entry = self.cache.get(query_hash)
+        if entry is not None:
+            current_time = time.monotonic_ns()
+            if current_time - entry[0] < self._ttl_ns:
+                self.cache[query_hash] = (current_time, entry[1])
+                self.cache.move_to_end(query_hash)
+                return entry[1]
             else:
                 del self.cache[query_hash]
-                del self.access_times[query_hash]
+        
+        if self.redis_client is not None:
+            try:
+                payload = self.redis_client.get(self.key_prefix + str(query_hash))
+            except Exception as e:
+                logging.warning(f"Redis search cache read failed: {e}")
+                return None
+            if payload is not None:
+                try:
+                    results = _decode_results(payload)
+                except Exception as e:
+                    logging.warning(f"Discarding malformed Redis search cache entry: {e}")
+                    return None
+                self._put_local(query_hash, results)
+                return results
         return None
     
     def put(self, query_hash: str, results: Tuple[np.ndarray, np.ndarray]):
         """Store search results in cache"""
-        if len(self.cache) >= self.max_size:
-            # Evict oldest entry
-            oldest_key = min(self.access_times.keys(), key=self.access_times.get)
-            del self.cache[oldest_key]
-            del self.access_times[oldest_key]
-        
-        self.cache[query_hash] = results
-        self.access_times[query_hash] = time.time()
+        self._put_local(query_hash, results)
+        
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(
+                    self.key_prefix + str(query_hash),
+                    _encode_results(results),
+                    ex=self.ttl
+                )
+            except Exception as e:
+                logging.warning(f"Redis search cache write failed: {e}")
+    
+    def _put_local(self, query_hash: str, results: Tuple[np.ndarray, np.ndarray]):
+        """Store search results in the in-process LRU"""
+        if query_hash not in self.cache and len(self.cache) >= self.max_size:
+            # Evict the least recently used entry
+            self.cache.popitem(last=False)
+        
+        self.cache[query_hash] = (time.monotonic_ns(), results)
+        self.cache.move_to_end(query_hash)
 
 # Performance monitoring and optimization feedback
 class PerformanceMonitor:
     """Monitor and optimize FAISS performance in real-time"""
     
-    def __init__(self):
+    def __init__(self, capacity: int = SEARCH_TIMES_CAPACITY):
         self.metrics = {
-            'search_times': [],
             'memory_usage': [],
             'cache_hit_rate': 0,
             'throughput': 0
         }
+        # Search times live in a preallocated float32 ring; the newest
+        # capacity samples feed the report
+        self.search_times = np.empty(capacity, dtype=np.float32)
+        self._search_count = 0  # Total searches recorded; next slot is count % capacity
     
     def record_search(self, search_time: float, cache_hit: bool = False):
         """Record search performance metrics"""
-        self.metrics['search_times'].append(search_time)
+        self.search_times[self._search_count % len(self.search_times)] = search_time
+        self._search_count += 1
         if cache_hit:
             self.metrics['cache_hit_rate'] += 1
     
     def get_performance_report(self) -> dict:
         """Generate performance optimization report"""
-        if not self.metrics['search_times']:
+        if not self._search_count:
             return {}
         
-        avg_time = np.mean(self.metrics['search_times'])
-        p95_time = np.percentile(self.metrics['search_times'], 95)
+        view = self.search_times[:min(self._search_count, len(self.search_times))]
+        avg_time = float(view.mean(dtype=np.float64))
+        p95_time = float(np.percentile(view, 95))
         
         return {
             'average_search_time': avg_time,
             'p95_search_time': p95_time,
-            'total_searches': len(self.metrics['search_times']),
-            'cache_hit_rate': self.metrics['cache_hit_rate'] / len(self.metrics['search_times']),
+            'total_searches': self._search_count,
+            'cache_hit_rate': self.metrics['cache_hit_rate'] / self._search_count,
             'recommendation': self._get_optimization_recommendation(avg_time)
         }
     
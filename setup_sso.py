@@ -5,7 +5,20 @@ Interactive script to help set up SSO providers
 """
 import os
 import sys
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Callable, FrozenSet, Tuple
+
+# Environment variables read by the SSO integration
+_SSO_VARS: Tuple[str, ...] = (
+    'SSO_ENABLED', 'SAML_ENABLED', 'OIDC_ENABLED',
+    'SAML_ENTITY_ID', 'SAML_SSO_URL', 'SAML_ACS_URL', 'SAML_X509_CERT',
+    'OIDC_CLIENT_ID', 'OIDC_CLIENT_SECRET', 'OIDC_DISCOVERY_URL',
+    'OIDC_AUTH_ENDPOINT', 'OIDC_TOKEN_ENDPOINT', 'OIDC_USERINFO_ENDPOINT',
+    'OIDC_REDIRECT_URI'
+)
+
+# Variables whose values are masked when displayed
+_SENSITIVE: FrozenSet[str] = frozenset({'SAML_X509_CERT', 'OIDC_CLIENT_SECRET'})
 
 def print_banner():
     """Print setup banner"""
@@ -265,20 +278,13 @@ def show_current_configuration():
     print("\n📋 Current SSO Configuration")
     print("=" * 40)
     
-    sso_vars = [
-        'SSO_ENABLED', 'SAML_ENABLED', 'OIDC_ENABLED',
-        'SAML_ENTITY_ID', 'SAML_SSO_URL', 'SAML_ACS_URL', 'SAML_X509_CERT',
-        'OIDC_CLIENT_ID', 'OIDC_CLIENT_SECRET', 'OIDC_DISCOVERY_URL',
-        'OIDC_AUTH_ENDPOINT', 'OIDC_TOKEN_ENDPOINT', 'OIDC_USERINFO_ENDPOINT',
-        'OIDC_REDIRECT_URI'
-    ]
-    
+    env = os.environ
     current_config = {}
-    for var in sso_vars:
-        value = os.getenv(var)
+    for var in _SSO_VARS:
+        value = env.get(var)
         if value:
             # Mask sensitive values
-            if 'SECRET' in var or 'CERT' in var:
+            if var in _SENSITIVE:
                 display_value = f"{value[:8]}...***"
             else:
                 display_value = value
@@ -294,25 +300,32 @@ def show_current_configuration():
     
     return current_config
 
+# Usage notes appended to every generated configuration file
+_CONFIG_FILE_FOOTER = (
+    "\n# Usage:\n"
+    "# 1. Review and update the configuration values\n"
+    "# 2. Source this file: source .env.sso\n"
+    "# 3. Or copy variables to your main .env file\n"
+    "# 4. Restart the RAG system to apply changes\n"
+)
+
 def generate_configuration_file(config: Dict[str, str], filename: str = ".env.sso"):
     """Generate configuration file"""
     print(f"\n📄 Generating configuration file: {filename}")
     print("=" * 50)
     
     try:
+        # Assembled in memory and written with a single call
+        parts = [
+            "# SSO Configuration\n",
+            "# Generated by SSO Configuration Helper\n",
+            f"# Created: {datetime.now()}\n\n"
+        ]
+        parts.extend(f"{key}={value}\n" for key, value in config.items())
+        parts.append(_CONFIG_FILE_FOOTER)
+        
         with open(filename, 'w') as f:
-            f.write("# SSO Configuration\n")
-            f.write("# Generated by SSO Configuration Helper\n")
-            f.write(f"# Created: {__import__('datetime').datetime.now()}\n\n")
-            
-            for key, value in config.items():
-                f.write(f"{key}={value}\n")
-            
-            f.write("\n# Usage:\n")
-            f.write("# 1. Review and update the configuration values\n")
-            f.write("# 2. Source this file: source .env.sso\n")
-            f.write("# 3. Or copy variables to your main .env file\n")
-            f.write("# 4. Restart the RAG system to apply changes\n")
+            f.write(''.join(parts))
         
         print(f"✅ Configuration saved to {filename}")
         print("\nTo use this configuration:")
@@ -323,6 +336,31 @@ def generate_configuration_file(config: Dict[str, str], filename: str = ".env.ss
     except Exception as e:
         print(f"❌ Failed to create configuration file: {e}")
 
+def _generate_configuration_action(config: Dict[str, str]):
+    """Menu action: write the current configuration to the default file"""
+    if not config:
+        print("⚠️ No configuration to generate. Please configure a provider first.")
+        return
+    generate_configuration_file(config)
+
+# Menu choices that configure a provider and return its settings
+_PROVIDER_DISPATCH: Dict[str, Callable[[], Dict[str, str]]] = {
+    '1': configure_google_oidc,
+    '2': configure_microsoft_oidc,
+    '3': configure_auth0_oidc,
+    '4': configure_okta_oidc,
+    '5': configure_okta_saml,
+    '6': configure_adfs_saml,
+    '7': configure_generic_oidc,
+    '8': configure_generic_saml,
+}
+
+# Menu choices that act on the current configuration without replacing it
+_ACTION_DISPATCH: Dict[str, Callable[[Dict[str, str]], Any]] = {
+    '9': lambda config: show_current_configuration(),
+    '10': _generate_configuration_action,
+}
+
 def main():
     """Main configuration interface"""
     print_banner()
@@ -337,30 +375,12 @@ def main():
             if choice == '0':
                 print("👋 Goodbye!")
                 break
-            elif choice == '1':
-                config = configure_google_oidc()
-            elif choice == '2':
-                config = configure_microsoft_oidc()
-            elif choice == '3':
-                config = configure_auth0_oidc()
-            elif choice == '4':
-                config = configure_okta_oidc()
-            elif choice == '5':
-                config = configure_okta_saml()
-            elif choice == '6':
-                config = configure_adfs_saml()
-            elif choice == '7':
-                config = configure_generic_oidc()
-            elif choice == '8':
-                config = configure_generic_saml()
-            elif choice == '9':
-                show_current_configuration()
-                continue
-            elif choice == '10':
-                if not config:
-                    print("⚠️ No configuration to generate. Please configure a provider first.")
-                    continue
-                generate_configuration_file(config)
+            
+            handler = _PROVIDER_DISPATCH.get(choice)
+            if handler is not None:
+                config = handler()
+            elif choice in _ACTION_DISPATCH:
+                _ACTION_DISPATCH[choice](config)
                 continue
             else:
                 print("❌ Invalid option. Please try again.")
@@ -0,0 +1,672 @@
+"""
+Phase 2 Optimization Tests
+Test the phase2 monitoring, load testing and vector search optimizations
+"""
+
+import asyncio
+import csv
+import importlib.util
+import io
+import pickle
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PHASE2_DIR = Path(__file__).resolve().parent.parent / "phase2-rag"
+
+
+def load_phase2_module(name, relative_path):
+    """Load a phase2-rag module by path; several live in hyphenated files."""
+    spec = importlib.util.spec_from_file_location(name, PHASE2_DIR / relative_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def real_time_monitoring():
+    """The real-time monitoring module, skipped without its runtime dependencies."""
+    for dependency in ("redis", "psutil", "prometheus_client", "websockets"):
+        pytest.importorskip(dependency)
+    return load_phase2_module("real_time_monitoring", "monitoring/real-time-monitoring.py")
+
+
+@pytest.fixture(scope="module")
+def vector_optimizer():
+    """The vector optimizer module."""
+    return load_phase2_module("vector_optimizer", "vector-optimization/vector_optimizer.py")
+
+
+@pytest.fixture(scope="module")
+def concurrency_manager():
+    """The concurrency manager module."""
+    return load_phase2_module("concurrency_manager", "concurrency/concurrency_manager.py")
+
+
+@pytest.fixture(scope="module")
+def faiss_optimization():
+    """The FAISS optimization module, skipped without faiss."""
+    pytest.importorskip("faiss")
+    return load_phase2_module("faiss_optimization", "vector-optimization/faiss-optimization.py")
+
+
+@pytest.fixture(scope="module")
+def enhanced_monitor():
+    """The enhanced monitor module, with its global monitor's thread stopped."""
+    module = load_phase2_module("enhanced_monitor", "monitoring/enhanced_monitor.py")
+    module.enhanced_monitor.stop()
+    return module
+
+
+@pytest.fixture(scope="module")
+def load_testing_suite():
+    """The load testing suite module, skipped without its runtime dependencies."""
+    for dependency in ("psutil", "matplotlib"):
+        pytest.importorskip(dependency)
+    return load_phase2_module("load_testing_suite", "testing/load-testing-suite.py")
+
+
+@pytest.fixture
+def latency_samples():
+    """Log-normal latencies in seconds, roughly 50ms median with a long tail."""
+    rng = np.random.default_rng(42)
+    return rng.lognormal(mean=np.log(0.05), sigma=0.6, size=20_000)
+
+
+class TestMetricStorage:
+    """Test the ring-buffered metric columns."""
+
+    def test_window_statistics_after_wrap(self, real_time_monitoring):
+        """Test window statistics over samples that straddle the ring head."""
+        storage = real_time_monitoring.MetricStorage(max_size=8)
+        now_ns = time.monotonic_ns()
+        response_times = np.linspace(0.01, 0.2, 20)
+        for i, response_time in enumerate(response_times):
+            # Samples from 19.5s ago to 0.5s ago, one second apart
+            offset_ns = int((19.5 - i) * real_time_monitoring.NS_PER_SECOND)
+            storage.add_metric(
+                real_time_monitoring.PerformanceMetric(
+                    timestamp=time.time(),
+                    response_time=float(response_time),
+                    status_code=500 if i == 18 else 200,
+                    timestamp_ns=now_ns - offset_ns,
+                )
+            )
+
+        assert storage.count == 8
+        stats = storage.get_window_statistics((5, 300))
+
+        # Only the last 8 samples survive the wrap
+        retained = response_times[-8:]
+        assert stats[300]["total_requests"] == 8
+        assert stats[300]["avg_response_time"] == pytest.approx(retained.mean())
+        assert stats[300]["p95_response_time"] == pytest.approx(np.percentile(retained, 95))
+        assert stats[300]["min_response_time"] == pytest.approx(retained.min())
+
+        # The last 5 samples sit at ring slots 7, 0, 1, 2 and 3
+        recent = response_times[-5:]
+        assert stats[5]["total_requests"] == 5
+        assert stats[5]["error_count"] == 1
+        assert stats[5]["median_response_time"] == pytest.approx(np.median(recent))
+        assert stats[5]["p95_response_time"] == pytest.approx(np.percentile(recent, 95))
+        assert stats[5]["max_response_time"] == pytest.approx(recent.max())
+
+    def test_recent_metrics_after_wrap(self, real_time_monitoring):
+        """Test that recent metrics come back oldest first after a wrap."""
+        storage = real_time_monitoring.MetricStorage(max_size=4)
+        now_ns = time.monotonic_ns()
+        for i in range(10):
+            storage.add_metric(
+                real_time_monitoring.PerformanceMetric(
+                    timestamp=time.time(), response_time=float(i), status_code=200, timestamp_ns=now_ns - (10 - i)
+                )
+            )
+
+        recent = storage.get_recent_metrics(window_seconds=300)
+        assert [metric.response_time for metric in recent] == [6.0, 7.0, 8.0, 9.0]
+
+    def test_recent_metrics_window_cutoff(self, real_time_monitoring):
+        """Test that the binary-searched cutoff excludes older samples on both ring segments."""
+        storage = real_time_monitoring.MetricStorage(max_size=6)
+        now_ns = time.monotonic_ns()
+        for i in range(9):
+            # Samples from 8.5s ago to 0.5s ago, one second apart
+            offset_ns = int((8.5 - i) * real_time_monitoring.NS_PER_SECOND)
+            storage.add_metric(
+                real_time_monitoring.PerformanceMetric(
+                    timestamp=time.time(), response_time=float(i), status_code=200, timestamp_ns=now_ns - offset_ns
+                )
+            )
+
+        # Retained samples 3..8 sit at slots 3, 4, 5, 0, 1, 2
+        assert [metric.response_time for metric in storage.get_recent_metrics(4)] == [5.0, 6.0, 7.0, 8.0]
+        assert [metric.response_time for metric in storage.get_recent_metrics(2)] == [7.0, 8.0]
+
+
+
+class TestLatencyHistogram:
+    """Test the time-sliced monitoring histogram read by the alert path."""
+
+    # One 5% bucket, reported at its geometric midpoint
+    REL_TOLERANCE = 0.05
+    QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+    def test_window_quantiles_match_percentile(self, real_time_monitoring, latency_samples):
+        """Test window_totals plus bucket_quantiles against np.percentile."""
+        histogram = real_time_monitoring.LatencyHistogram(max_window_seconds=60, slice_seconds=5)
+        now_ns = time.monotonic_ns()
+        for i, value in enumerate(latency_samples):
+            # Spread the samples over the last 50 seconds
+            histogram.record(value, now_ns - (i % 50) * real_time_monitoring.NS_PER_SECOND, is_error=i % 100 == 0)
+
+        count, latency_sum, errors, bucket_counts = histogram.window_totals(60, now_ns)
+        assert count == len(latency_samples)
+        assert latency_sum == pytest.approx(latency_samples.sum())
+        assert errors == len(latency_samples) // 100
+
+        quantiles = real_time_monitoring.bucket_quantiles(histogram.bucket_values, bucket_counts, self.QUANTILES)
+        expected = np.percentile(latency_samples, [q * 100 for q in self.QUANTILES])
+        assert quantiles == pytest.approx(expected, rel=self.REL_TOLERANCE)
+
+    def test_window_drops_expired_slices(self, real_time_monitoring):
+        """Test that samples older than the window no longer count."""
+        histogram = real_time_monitoring.LatencyHistogram(max_window_seconds=60, slice_seconds=5)
+        now_ns = time.monotonic_ns()
+        histogram.record(5.0, now_ns - 120 * real_time_monitoring.NS_PER_SECOND)
+        histogram.record(0.01, now_ns)
+
+        count, latency_sum, _, bucket_counts = histogram.window_totals(60, now_ns)
+        assert count == 1
+        assert latency_sum == pytest.approx(0.01)
+        (p99,) = real_time_monitoring.bucket_quantiles(histogram.bucket_values, bucket_counts, [0.99])
+        assert p99 == pytest.approx(0.01, rel=self.REL_TOLERANCE)
+
+    def test_bucket_quantiles_empty(self, real_time_monitoring):
+        """Test that empty counts have no quantiles."""
+        histogram = real_time_monitoring.LatencyHistogram()
+        assert real_time_monitoring.bucket_quantiles(histogram.bucket_values, histogram.counts[0], [0.5]) is None
+
+
+class TestConcurrencyManager:
+    """Test request timing and the latency histogram of the concurrency manager."""
+
+    # One 5% bucket, reported at its geometric midpoint
+    REL_TOLERANCE = 0.05
+    QUANTILES = [0.5, 0.9, 0.95, 0.99]
+
+    def test_histogram_matches_percentile(self, concurrency_manager, latency_samples):
+        """Test the latency histogram against np.percentile."""
+        histogram = concurrency_manager.LatencyHistogram()
+        samples_ms = latency_samples * 1000
+        for value in samples_ms:
+            histogram.record(value)
+
+        expected = np.percentile(samples_ms, [q * 100 for q in self.QUANTILES])
+        assert histogram.quantiles(self.QUANTILES) == pytest.approx(expected, rel=self.REL_TOLERANCE)
+
+    def test_histogram_empty(self, concurrency_manager):
+        """Test that an empty histogram reports no quantiles."""
+        assert concurrency_manager.LatencyHistogram().quantiles([0.5]) is None
+
+    def test_forwarded_requests_are_timed(self, concurrency_manager):
+        """Test that concurrent forwarded requests each time their own span."""
+        manager = concurrency_manager.ConcurrencyManager(max_workers=4)
+        delays = {"http://a": 0.02, "http://b": 0.06}
+
+        async def forward(request_data):
+            await asyncio.sleep(delays[request_data["url"]])
+            return 200
+
+        manager._forward_request = forward
+
+        async def run():
+            return await asyncio.gather(*(manager._process_async({"url": url}) for url in delays))
+
+        fast, slow = asyncio.run(run())
+        assert fast["status_code"] == slow["status_code"] == 200
+        assert 20 <= fast["processing_time"] < 60
+        assert slow["processing_time"] >= 60
+        assert manager.get_stats()["completed_requests"] == 2
+
+
+class TestEnhancedMonitor:
+    """Test the phase2 monitor's sample ring and event counters."""
+
+    @pytest.fixture
+    def monitor(self, enhanced_monitor):
+        """A monitor whose background collection thread has exited."""
+        monitor = enhanced_monitor.EnhancedMonitor()
+        monitor.stop()
+        monitor.monitoring_thread.join()
+        return monitor
+
+    def test_event_counts_across_threads(self, monitor):
+        """Test that events recorded from several threads are all counted."""
+
+        def record():
+            for _ in range(1000):
+                monitor.record_vector_optimization(12.5)
+            monitor.record_ui_interaction("click", 4.0)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        monitor.record_concurrent_request(3.0)
+
+        counts = monitor.get_phase2_summary()["optimization_stats"]
+        assert counts == {"vector_optimizations": 4000, "concurrent_requests": 1, "ui_interactions": 4}
+        assert monitor.get_full_metrics()["phase2_stats"]["vector_optimizations"] == 4000
+
+    def test_phase2_samples_after_wrap(self, enhanced_monitor, monitor):
+        """Test the phase2 sample ring and summary after it has wrapped."""
+        size = enhanced_monitor.METRICS_HISTORY_SIZE
+        written = []
+        for _ in range(2 * size + size // 2):
+            monitor.collect_phase2_metrics()
+            written.append(monitor._phase2_buf[(monitor._phase2_head - 1) % size].tolist())
+
+        samples = monitor._phase2_samples()
+        assert len(samples) == size
+        expected = written[-size:]
+        assert [sample["vector_search_time"] for sample in samples] == [row[1] for row in expected]
+        assert [sample["timestamp"] for sample in samples] == [row[0] for row in expected]
+
+        window = np.array(written[-enhanced_monitor.SUMMARY_WINDOW_SIZE:])
+        metrics = monitor.get_phase2_summary()["performance_metrics"]
+        assert metrics["avg_vector_search_time"] == round(float(window[:, 1].mean()), 2)
+        assert metrics["avg_ui_response_time"] == round(float(window[:, 3].mean()), 2)
+
+
+class TestVectorSearchCache:
+    """Test that cached vector searches return what a fresh search would."""
+
+    @pytest.fixture
+    def database(self):
+        """Random unit vectors with one document per row."""
+        rng = np.random.default_rng(7)
+        vectors = rng.standard_normal((200, 32)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors, [f"doc-{i}" for i in range(len(vectors))]
+
+    def test_cache_hit_matches_uncached_search(self, vector_optimizer, database):
+        """Test that a cache hit returns the uncached search results."""
+        vectors, documents = database
+        query = vectors[3] + 0.1 * vectors[4]
+
+        uncached = vector_optimizer.VectorSearchOptimizer(vectors, documents).optimized_search(query, top_k=5)
+        optimizer = vector_optimizer.VectorSearchOptimizer(vectors, documents)
+        first = optimizer.optimized_search(query, top_k=5)
+        second = optimizer.optimized_search(query, top_k=5)
+
+        assert not first["cached"]
+        assert second["cached"]
+        assert second["results"] == first["results"] == uncached["results"]
+        assert optimizer.get_stats()["cache_hits"] == 1
+
+    def test_fingerprint_collision_is_not_a_hit(self, vector_optimizer, database):
+        """Test that two queries sharing a fingerprint get their own results."""
+        vectors, documents = database
+        query = vectors[10].copy()
+        # Same edges, different middle: the shape of the old edge-hash collision
+        other = query.copy()
+        middle = len(other) // 2
+        other[middle - 4:middle + 4] = vectors[20][middle - 4:middle + 4]
+
+        optimizer = vector_optimizer.VectorSearchOptimizer(vectors, documents)
+        fingerprint = vector_optimizer.query_fingerprint(query)
+        optimizer.optimized_search(query, top_k=5, fingerprint=fingerprint)
+        colliding = optimizer.optimized_search(other, top_k=5, fingerprint=fingerprint)
+
+        expected = vector_optimizer.VectorSearchOptimizer(vectors, documents).optimized_search(other, top_k=5)
+        assert not colliding["cached"]
+        assert colliding["results"] == expected["results"]
+
+    def test_fingerprint_covers_whole_vector(self, vector_optimizer, monkeypatch):
+        """Test that the fallback fingerprint sees bytes in the middle of the vector."""
+        monkeypatch.setattr(vector_optimizer, "XXHASH_AVAILABLE", False)
+        query = np.arange(1024, dtype=np.float32)
+        # Swapping two middle elements keeps the edges and the norm
+        other = query.copy()
+        other[[511, 512]] = other[[512, 511]]
+
+        assert vector_optimizer.query_fingerprint(query) != vector_optimizer.query_fingerprint(other)
+
+    def test_top_k_is_part_of_the_cache_key(self, vector_optimizer, database):
+        """Test that a different top_k is not served from the cache."""
+        vectors, documents = database
+        optimizer = vector_optimizer.VectorSearchOptimizer(vectors, documents)
+        optimizer.optimized_search(vectors[0], top_k=3)
+        wider = optimizer.optimized_search(vectors[0], top_k=8)
+
+        assert not wider["cached"]
+        assert len(wider["results"]) == 8
+        assert wider["results"][0]["content"] == "doc-0"
+
+    def test_cache_hit_does_not_copy_the_query(self, vector_optimizer):
+        """Test that serving a hit allocates less than one copy of the query."""
+        vectors = np.random.default_rng(3).standard_normal((50, 4096)).astype(np.float32)
+        optimizer = vector_optimizer.VectorSearchOptimizer(vectors)
+        query = vectors[1].copy()
+        fingerprint = vector_optimizer.query_fingerprint(query)
+        optimizer.optimized_search(query, top_k=5, fingerprint=fingerprint)
+
+        tracemalloc.start()
+        try:
+            hit = optimizer.optimized_search(query, top_k=5, fingerprint=fingerprint)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert hit["cached"]
+        assert peak < query.nbytes
+
+
+class TestVectorSearchStats:
+    """Test the lock-free per-thread search stats."""
+
+    def test_stats_sum_over_threads(self, vector_optimizer):
+        """Test that searches counted on several threads all reach get_stats."""
+        optimizer = vector_optimizer.VectorSearchOptimizer()
+
+        def record(search_time):
+            for _ in range(500):
+                optimizer._record_search(search_time, False)
+            optimizer._record_search(0.0, True)
+
+        threads = [threading.Thread(target=record, args=(float(ms),)) for ms in (1, 2, 3, 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = optimizer.get_stats()
+        assert stats["total_searches"] == 2000
+        assert stats["cache_hits"] == 4
+        assert stats["avg_search_time"] == 2.5
+
+    def test_stats_window_after_wrap(self, vector_optimizer, monkeypatch):
+        """Test that averages cover only the retained uncached searches."""
+        monkeypatch.setattr(vector_optimizer, "STATS_CAPACITY", 4)
+        optimizer = vector_optimizer.VectorSearchOptimizer()
+        for ms in range(10):
+            optimizer._record_search(float(ms), ms == 8)
+
+        stats = optimizer.get_stats()
+        assert stats["total_searches"] == 9
+        assert stats["cache_hits"] == 1
+        # Rows 6..9 are retained; row 8 was a cache hit
+        assert stats["avg_search_time"] == round((6 + 7 + 9) / 3, 2)
+
+    def test_stats_empty(self, vector_optimizer):
+        """Test stats before any search."""
+        stats = vector_optimizer.VectorSearchOptimizer().get_stats()
+        assert stats["total_searches"] == 0
+        assert stats["avg_search_time"] == 0.0
+
+
+class TestLoadTestMetrics:
+    """Test the load test result aggregation."""
+
+    # One 1% bucket, reported at its geometric midpoint
+    REL_TOLERANCE = 0.01
+
+    @staticmethod
+    def record(load_testing_suite, metrics, response_times, failures=()):
+        """Queue one result per response time, a second apart, and drain them."""
+        for i, response_time in enumerate(response_times):
+            failed = i in failures
+            metrics.add_result(
+                load_testing_suite.TestResult(
+                    timestamp=1000.0 + i,
+                    response_time=float(response_time),
+                    status_code=503 if failed else 200,
+                    success=not failed,
+                    error_message="HTTP 503" if failed else None,
+                )
+            )
+        metrics.drain()
+
+    def test_histogram_percentiles_match_percentile(self, load_testing_suite, latency_samples):
+        """Test the response time histogram against np.percentile."""
+        histogram = load_testing_suite.ResponseTimeHistogram()
+        for value in latency_samples:
+            histogram.record(value)
+
+        percentiles = load_testing_suite.PERCENTILES
+        expected = np.percentile(latency_samples, percentiles)
+        assert histogram.percentiles(percentiles) == pytest.approx(expected, rel=self.REL_TOLERANCE)
+
+    def test_histogram_distribution(self, load_testing_suite, latency_samples):
+        """Test that the distribution bars cover every sample in order."""
+        histogram = load_testing_suite.ResponseTimeHistogram()
+        for value in latency_samples:
+            histogram.record(value)
+
+        edges, counts = histogram.distribution(50)
+        assert len(counts) == len(edges) - 1 <= 50
+        assert counts.sum() == len(latency_samples)
+        assert np.all(np.diff(edges) > 0)
+        assert edges[0] <= latency_samples.min() and edges[-1] > latency_samples.max()
+
+    def test_report_reads_histogram_by_default(self, load_testing_suite, latency_samples):
+        """Test the default report: streaming percentiles, exact running totals, no raw columns."""
+        samples = latency_samples[:2000]
+        metrics = load_testing_suite.PerformanceMetrics()
+        self.record(load_testing_suite, metrics, samples, failures={3, 7})
+
+        stats = metrics.get_statistics()
+        assert metrics.columns == {}
+        assert stats["summary"]["total_requests"] == 2000
+        assert stats["summary"]["failed_requests"] == 2
+        assert stats["summary"]["test_duration"] == 1999.0
+        assert stats["errors"] == {"503_HTTP 503": 2}
+
+        response_times = stats["response_times"]
+        assert response_times["average"] == pytest.approx(samples.mean())
+        assert response_times["standard_deviation"] == pytest.approx(samples.std(ddof=1))
+        assert response_times["min"] == samples.min()
+        assert response_times["max"] == samples.max()
+        p50, p90, p95, p99 = np.percentile(samples, load_testing_suite.PERCENTILES)
+        assert response_times["p50"] == pytest.approx(p50, rel=self.REL_TOLERANCE)
+        assert response_times["p95"] == pytest.approx(p95, rel=self.REL_TOLERANCE)
+        assert response_times["p99"] == pytest.approx(p99, rel=self.REL_TOLERANCE)
+
+    def test_report_percentiles_exact_with_samples(self, load_testing_suite, latency_samples):
+        """Test that keeping raw samples gives exact percentiles."""
+        samples = latency_samples[:1000]
+        metrics = load_testing_suite.PerformanceMetrics(keep_samples=True)
+        self.record(load_testing_suite, metrics, samples)
+
+        stats = metrics.get_statistics()
+        p50, p90, p95, p99 = np.percentile(samples, load_testing_suite.PERCENTILES)
+        assert stats["response_times"]["p50"] == p50
+        assert stats["response_times"]["p95"] == p95
+        assert stats["response_times"]["p99"] == p99
+
+
+    def test_columns_grow_past_capacity(self, load_testing_suite):
+        """Test that kept sample columns grow and keep every earlier value."""
+        metrics = load_testing_suite.PerformanceMetrics(capacity=4, keep_samples=True)
+        response_times = np.linspace(0.01, 0.11, 11)
+        self.record(load_testing_suite, metrics, response_times, failures={9})
+
+        assert len(metrics) == 11
+        assert len(metrics.columns["timestamp"]) >= 11
+        assert all(len(column) == len(metrics.columns["timestamp"]) for column in metrics.columns.values())
+        np.testing.assert_array_equal(metrics.column("response_time"), response_times)
+        np.testing.assert_array_equal(metrics.column("timestamp"), 1000.0 + np.arange(11))
+        assert metrics.column("success").tolist() == [i != 9 for i in range(11)]
+        assert metrics.column("status_code")[9] == 503
+        assert metrics.error_messages == {9: "HTTP 503"}
+
+
+    def test_results_wait_in_queue_until_drained(self, load_testing_suite):
+        """Test that queued results reach the totals only when drained."""
+        metrics = load_testing_suite.PerformanceMetrics()
+        for i in range(5):
+            metrics.add_result(
+                load_testing_suite.TestResult(timestamp=1000.0 + i, response_time=0.01, status_code=200, success=True)
+            )
+
+        assert len(metrics) == 0
+        assert metrics.progress_percentiles() is None
+        assert metrics.drain() == 5
+        assert metrics.drain() == 0
+        assert len(metrics) == 5
+
+        metrics.add_result(
+            load_testing_suite.TestResult(timestamp=1005.0, response_time=0.02, status_code=200, success=True)
+        )
+        # get_statistics folds in anything still queued
+        assert metrics.get_statistics()["summary"]["total_requests"] == 6
+
+    def test_results_queued_from_threads(self, load_testing_suite):
+        """Test that results queued from several threads are all drained."""
+        metrics = load_testing_suite.PerformanceMetrics(keep_samples=True)
+
+        def produce(user_id):
+            for i in range(250):
+                metrics.add_result(
+                    load_testing_suite.TestResult(
+                        timestamp=1000.0 + i, response_time=0.01, status_code=200, success=True, user_id=user_id
+                    )
+                )
+
+        threads = [threading.Thread(target=produce, args=(user_id,)) for user_id in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert metrics.drain() == 1000
+        assert sorted(np.bincount(metrics.column("user_id")).tolist()) == [250] * 4
+
+
+    @pytest.mark.parametrize("size, window, step", [(200, 10, 5), (201, 20, 10), (57, 7, 1), (30, 30, 15)])
+    def test_rolling_success_rate_matches_windowed_mean(self, load_testing_suite, size, window, step):
+        """Test the chart's running-sum kernel against a naive windowed mean."""
+        success = (np.random.default_rng(size).random(size) < 0.9).view(np.uint8)
+
+        expected = [success[start:start + window].mean() for start in range(0, size - window + 1, step)]
+        rates = load_testing_suite.rolling_success_rate(success, window, step)
+        assert rates == pytest.approx(expected)
+
+    def test_csv_streams_every_row(self, load_testing_suite, monkeypatch, tmp_path):
+        """Test that the chunked CSV writer emits every result once, in order."""
+        monkeypatch.setattr(load_testing_suite, "CSV_CHUNK_ROWS", 7)
+        tester = load_testing_suite.RAGLoadTester(
+            load_testing_suite.LoadTestConfig(output_dir=str(tmp_path), exact_percentiles=True)
+        )
+        self.record(load_testing_suite, tester.metrics, np.linspace(0.01, 0.23, 23), failures={0, 7, 14})
+
+        tester.save_results({})
+        (csv_file,) = tmp_path.glob("load_test_results_*.csv")
+        with open(csv_file, newline="") as f:
+            rows = list(csv.reader(f))
+
+        assert rows[0] == list(load_testing_suite.CSV_FIELDS)
+        assert len(rows) == 24
+        assert [float(row[0]) for row in rows[1:]] == [1000.0 + i for i in range(23)]
+        assert [row[4] for row in rows[1:]].count("HTTP 503") == 3
+        assert rows[8][4] == "HTTP 503" and rows[9][4] == ""
+
+
+class TestFaissOptimization:
+    """Test the FAISS recall check and the shared search cache encoding."""
+
+    @staticmethod
+    def reference_recall(retrieved, ground_truth):
+        """Recall@k by Python set intersection, one query at a time."""
+        total = 0.0
+        for i, gt in enumerate(ground_truth):
+            if i < len(retrieved):
+                total += len(set(retrieved[i].tolist()) & set(gt)) / len(set(gt))
+        return total / len(ground_truth)
+
+    def test_recall_with_ragged_ground_truth(self, faiss_optimization):
+        """Test recall against ragged, duplicated ground truth and -1 padded results."""
+        optimizer = faiss_optimization.FAISSOptimizer(faiss_optimization.OptimizationConfig(use_gpu=False))
+        # faiss pads rows with -1 when fewer than k neighbours are found
+        retrieved = np.array([
+            [4, 2, 9, -1],
+            [1, 5, 6, 7],
+            [-1, -1, -1, -1],
+            [3, 8, 0, 2],
+        ])
+        ground_truth = [
+            [2, 4, 4, 11],
+            [7],
+            [1, 2],
+            [8, 3, 0, 2, 5, 6],
+        ]
+
+        recall = optimizer._calculate_recall(retrieved, ground_truth)
+        assert recall == pytest.approx(self.reference_recall(retrieved, ground_truth))
+        assert recall == pytest.approx((2 / 3 + 1 + 0 + 4 / 6) / 4)
+
+    def test_recall_counts_missing_rows_as_misses(self, faiss_optimization):
+        """Test that ground truth rows without retrieved results score zero."""
+        optimizer = faiss_optimization.FAISSOptimizer(faiss_optimization.OptimizationConfig(use_gpu=False))
+        retrieved = np.array([[0, 1], [2, 3]])
+        ground_truth = [[0, 1], [2, 9], [4, 5]]
+
+        recall = optimizer._calculate_recall(retrieved, ground_truth)
+        assert recall == pytest.approx(self.reference_recall(retrieved, ground_truth))
+        assert recall == pytest.approx((1 + 0.5 + 0) / 3)
+
+    class DictRedis:
+        """In-memory stand-in for the two Redis calls SearchCache makes."""
+
+        def __init__(self):
+            self.store = {}
+
+        def get(self, key):
+            return self.store.get(key)
+
+        def set(self, key, value, ex=None):
+            self.store[key] = value
+
+    @pytest.fixture
+    def results(self):
+        """A (distances, indices) pair as returned by index.search."""
+        rng = np.random.default_rng(5)
+        return rng.random((3, 10), dtype=np.float32), rng.integers(-1, 1000, (3, 10))
+
+    def test_cache_round_trip_through_redis(self, faiss_optimization, results):
+        """Test that results written by one cache are read back intact by another."""
+        shared = self.DictRedis()
+        writer = faiss_optimization.SearchCache()
+        writer.redis_client = shared
+        writer.put("q1", results)
+
+        reader = faiss_optimization.SearchCache()
+        reader.redis_client = shared
+        distances, indices = reader.get("q1")
+        np.testing.assert_array_equal(distances, results[0])
+        np.testing.assert_array_equal(indices, results[1])
+        assert distances.dtype == np.float32 and indices.dtype == results[1].dtype
+        # The shared entry is now in the reader's local LRU too
+        assert "q1" in reader.cache
+
+    def test_cache_rejects_pickled_payloads(self, faiss_optimization):
+        """Test that pickled entries are refused instead of unpickled."""
+        shared = self.DictRedis()
+        cache = faiss_optimization.SearchCache()
+        cache.redis_client = shared
+
+        # A bare pickle, and an .npz whose array can only be read by unpickling
+        shared.store[cache.key_prefix + "pickle"] = pickle.dumps((np.zeros(2), np.zeros(2)))
+        buf = io.BytesIO()
+        np.savez(buf, distances=np.array([{"payload": 1}], dtype=object), indices=np.zeros(1))
+        shared.store[cache.key_prefix + "object"] = buf.getvalue()
+
+        assert cache.get("pickle") is None
+        assert cache.get("object") is None
+        with pytest.raises(ValueError):
+            faiss_optimization._decode_results(buf.getvalue())
@@ -0,0 +1,109 @@
+"""
+SSO Configuration Helper Tests
+Test the menu dispatch tables of the interactive setup_sso script
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SETUP_SSO_PATH = Path(__file__).resolve().parent.parent / "setup_sso.py"
+
+
+@pytest.fixture(scope="module")
+def setup_sso():
+    """The setup_sso script, loaded by path from the repository root."""
+    spec = importlib.util.spec_from_file_location("setup_sso", SETUP_SSO_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_menu(monkeypatch, module, answers):
+    """Run main() answering each input() prompt from the given list."""
+    replies = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(replies))
+    module.main()
+
+
+class TestDispatchTables:
+    """Test the lookup tables behind the menu choices"""
+
+    def test_provider_choices(self, setup_sso):
+        """Test choices 1-8 map to the provider configuration functions"""
+        assert setup_sso._PROVIDER_DISPATCH == {
+            '1': setup_sso.configure_google_oidc,
+            '2': setup_sso.configure_microsoft_oidc,
+            '3': setup_sso.configure_auth0_oidc,
+            '4': setup_sso.configure_okta_oidc,
+            '5': setup_sso.configure_okta_saml,
+            '6': setup_sso.configure_adfs_saml,
+            '7': setup_sso.configure_generic_oidc,
+            '8': setup_sso.configure_generic_saml,
+        }
+
+    def test_action_choices(self, setup_sso):
+        """Test the actions cover the remaining menu options except exit"""
+        assert set(setup_sso._ACTION_DISPATCH) == {'9', '10'}
+        assert setup_sso._ACTION_DISPATCH['10'] is setup_sso._generate_configuration_action
+        assert not set(setup_sso._ACTION_DISPATCH) & set(setup_sso._PROVIDER_DISPATCH)
+
+
+class TestMainMenu:
+    """Test main() routes menu choices through the dispatch tables"""
+
+    def test_provider_choice_configures_and_saves(self, setup_sso, monkeypatch, tmp_path):
+        """Test a provider choice stores its settings and offers to save them"""
+        config = {'SSO_ENABLED': 'true', 'OIDC_CLIENT_SECRET': 'secret-value'}
+        monkeypatch.setitem(setup_sso._PROVIDER_DISPATCH, '4', lambda: config)
+        saved = []
+        monkeypatch.setattr(
+            setup_sso, "generate_configuration_file",
+            lambda cfg, filename=".env.sso": saved.append((cfg, filename))
+        )
+        target = str(tmp_path / "okta.env")
+
+        run_menu(monkeypatch, setup_sso, ['4', 'y', target, '0'])
+
+        assert saved == [(config, target)]
+
+    def test_generate_action_uses_last_provider_config(self, setup_sso, monkeypatch):
+        """Test choice 10 writes the configuration from the previous provider"""
+        config = {'SSO_ENABLED': 'true', 'SAML_ENABLED': 'true'}
+        monkeypatch.setitem(setup_sso._PROVIDER_DISPATCH, '6', lambda: config)
+        saved = []
+        monkeypatch.setattr(
+            setup_sso, "generate_configuration_file",
+            lambda cfg, filename=".env.sso": saved.append((cfg, filename))
+        )
+
+        run_menu(monkeypatch, setup_sso, ['6', 'n', '10', '0'])
+
+        assert saved == [(config, ".env.sso")]
+
+    def test_generate_action_without_config(self, setup_sso, monkeypatch, capsys):
+        """Test choice 10 refuses to write before any provider is configured"""
+        monkeypatch.setattr(
+            setup_sso, "generate_configuration_file",
+            lambda *args, **kwargs: pytest.fail("nothing to generate")
+        )
+
+        run_menu(monkeypatch, setup_sso, ['10', '0'])
+
+        assert "No configuration to generate" in capsys.readouterr().out
+
+    def test_show_action(self, setup_sso, monkeypatch):
+        """Test choice 9 shows the current configuration"""
+        calls = []
+        monkeypatch.setattr(setup_sso, "show_current_configuration", lambda: calls.append(True))
+
+        run_menu(monkeypatch, setup_sso, ['9', '0'])
+
+        assert calls == [True]
+
+    def test_invalid_choice(self, setup_sso, monkeypatch, capsys):
+        """Test unknown choices are reported and the menu keeps running"""
+        run_menu(monkeypatch, setup_sso, ['11', '', '0'])
+
+        assert capsys.readouterr().out.count("Invalid option") == 2